@@ -1,239 +1,210 @@
 #!/usr/bin/env python3
 
+import argparse
+import asyncio
+import functools
 import json
-import time
 import os
-import socket
 import logging
-from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+import socket
+import sys
 import threading
-from notifications import eye_relax_reminder, posture_reminder, show_custom_reminder
-from logging.handlers import RotatingFileHandler
+import metrics
+from chart_renderer import current_rss_bytes
+from ipc_protocol import JOIN, SHARED_SOCKET_PATH, SOCKET_PATH, decode_frame, encode_frame
+from ipc_server import EventBroadcaster, serve_forever
+from log_pipeline import setup_logging
+from reminder_jobs import custom_reminder_params
+from reminder_modules import configured_modules
+from sessions import DATA_NAME, Session, SessionManager
+from trigger_engine import TriggerEngine
 
 # Use user-specific paths
-SOCKET_PATH = os.path.expanduser("~/.Remind2Rest.sock")
 CONFIG_PATH = os.path.expanduser("~/.config/Remind2Rest/reminder_config.json")
-LOG_PATH = os.path.expanduser("~/.local/share/Remind2Rest/Remind2Rest.log")
-
-# Ensure log directory exists
-os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-
-# Setup rotating file handler
-handler = RotatingFileHandler(
-    LOG_PATH,
-    maxBytes=1024 * 1024,  # 1MB per file
-    backupCount=3,  # Keep 3 backup files
-    encoding="utf-8",
-)
-handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-
-# Configure logging
-logging.getLogger().setLevel(logging.INFO)
-logging.getLogger().addHandler(handler)
-
-# Add startup message
-logging.info("Remind2Rest starting up...")
-
-current_status = {}
-
-
-def load_config():
+DATA_DIR = os.path.join(os.path.expanduser("~"), DATA_NAME)
+
+# The user's own reminders, or None in a shared daemon
+session = None
+# State transitions pushed to SUBSCRIBE connections
+events = EventBroadcaster()
+
+metrics.gauge("remind2rest_process_rss_bytes", "Resident memory of the daemon", func=current_rss_bytes)
+metrics.gauge("remind2rest_threads", "Live threads in the daemon", func=threading.active_count)
+
+
+def dispatch(session, request):
+    action = request.get("action")
+    if action == "custom_reminder":
+        session.show_adhoc_reminder(custom_reminder_params(request))
+        return "OK"
+    elif action == "schedule_reminder":
+        return session.schedule_custom_reminder(request)
+    elif action == "cancel_reminder":
+        return session.cancel_custom_reminder(int(request["reminder_id"]))
+    elif action == "list_reminders":
+        return session.reminders.jobs()
+    elif action == "RELOAD":
+        return session.reload_config(request.get("version"))
+    elif action in ("STATUS", "SUBSCRIBE"):
+        # A subscription starts from the current status, then gets events
+        return session.status()
+    elif action == "METRICS":
+        return metrics.snapshot()
+    raise ValueError(f"Unknown action: {action}")
+
+
+def dispatch_shared(manager, request, peer):
+    # Every request acts on the session of the user at the other end
+    if request.get("action") == JOIN:
+        return manager.join(peer, request.get("display"), request.get("xauthority"))
+    if request.get("action") == "METRICS":
+        # Metrics are the daemon's, not a user's, so they need no session
+        return metrics.snapshot()
+    return dispatch(manager.get(peer), request)
+
+
+def handle_legacy_command(session, command):
+    # Unframed clients send either a bare command name or a single JSON object
+    try:
+        request = json.loads(command)
+    except ValueError:
+        request = None
+    if not isinstance(request, dict):
+        request = {"action": command}
+    if request.get("action") not in ("custom_reminder", "RELOAD", "STATUS"):
+        return None
     try:
-        with open(CONFIG_PATH, "r") as file:
-            config = json.load(file)
-        validate_config(config)
-        return config
-    except json.JSONDecodeError:
-        logging.error(f"Error: Invalid JSON in {CONFIG_PATH}")
-    except FileNotFoundError:
-        logging.error(f"Error: Config file not found at {CONFIG_PATH}")
+        result = dispatch(session, request)
     except ValueError as e:
-        logging.error(f"Error: Invalid configuration - {str(e)}")
-    return None
-
-
-def validate_config(config):
-    if "global_interval" not in config:
-        raise ValueError("Missing 'global_interval' in config")
-    for module in ["eye_relax", "posture"]:
-        if module not in config:
-            raise ValueError(f"Missing '{module}' in config")
-        if "enabled" not in config[module]:
-            raise ValueError(f"Missing 'enabled' for module {module}")
-        if "reminders" not in config[module]:
-            raise ValueError(f"Missing 'reminders' for module {module}")
-
-
-def update_status(status):
-    global current_status
-    if (
-        not current_status
-        or current_status.get("next_reminder") != status["next_reminder"]
-    ):
-        minutes_to_next = int(status["time_to_next"].split(":")[0])
-        logging.info(
-            f"Next {status['next_reminder']} reminder in {minutes_to_next} minutes"
-        )
-    current_status = status
-
-
-def schedule_reminders(scheduler, config):
-    scheduler.remove_all_jobs()
-    interval_minutes = config["global_interval"]
-    logging.info(f"Scheduling reminders with {interval_minutes} minute intervals")
+        return json.dumps({"error": str(e)}).encode()
+    if request["action"] == "RELOAD":
+        # Old clients only understand a plain acknowledgement
+        return b"OK"
+    if isinstance(result, str):
+        return result.encode()
+    return json.dumps(result).encode()
+
+
+def warm_up_ui(session):
+    # Load the UI stack and build the reminder windows once the socket is
+    # answering, so neither startup nor the first reminder pays for it. If it
+    # fails, the reminders that follow try again.
+    try:
+        session.get_ui()
+    except Exception as e:
+        logging.error(f"Error loading reminder UI: {e}")
 
-    current_time = datetime.now()
-    elapsed_minutes = (current_time.hour * 60 + current_time.minute) % interval_minutes
 
-    next_times = []
-    for module in ["eye_relax", "posture"]:
-        if config[module]["enabled"]:
-            for reminder in config[module]["reminders"]:
-                minutes_until = (reminder - elapsed_minutes) % interval_minutes
-                next_times.append((minutes_until, module))
+def on_server_ready(session):
+    session.watch_config(asyncio.get_running_loop())
+    session.arm_custom_reminders()
+    threading.Thread(target=warm_up_ui, args=(session,), name="WarmUp", daemon=True).start()
 
-    next_reminder = min(next_times, key=lambda x: x[0])
-    logging.info(
-        f"First {next_reminder[1]} reminder will trigger in {next_reminder[0]} minutes"
-    )
 
-    def check_and_trigger_reminders():
-        current_time = datetime.now()
-        elapsed_minutes = (
-            current_time.hour * 60 + current_time.minute
-        ) % interval_minutes
-        elapsed_seconds = current_time.second
+def run_single_user():
+    global session
+    scheduler = TriggerEngine().start()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    session = Session(scheduler, CONFIG_PATH, events, data_dir=DATA_DIR)
 
-        next_reminder = None
-        next_reminder_type = None
-        time_to_next = float("inf")
+    try:
+        if "error" in session.reload_config():
+            logging.error("Error loading configuration. Exiting.")
+            return
 
-        for module in ["eye_relax", "posture"]:
+        logging.info("Remind2Rest started successfully with configuration:")
+        config = session.schedule.config
+        for module in configured_modules(config):
             if config[module]["enabled"]:
-                for reminder in config[module]["reminders"]:
-                    time_to_reminder = (
-                        (reminder - elapsed_minutes) % interval_minutes
-                    ) * 60 - elapsed_seconds
-                    if 0 <= time_to_reminder < time_to_next:
-                        time_to_next = time_to_reminder
-                        next_reminder = reminder
-                        next_reminder_type = module
-
-                    if elapsed_minutes == reminder and elapsed_seconds < 1:
-                        trigger_reminder(module, config[module])
-
-        minutes_to_next, seconds_to_next = divmod(int(time_to_next), 60)
-        status = {
-            "running": True,
-            "next_reminder": next_reminder_type,
-            "time_to_next": f"{minutes_to_next:02d}:{seconds_to_next:02d}",
-            "total_interval": f"{interval_minutes:02d}",
-        }
-        update_status(status)
-
-    scheduler.add_job(check_and_trigger_reminders, IntervalTrigger(seconds=1))
-
-
-def trigger_reminder(module, settings):
-    logging.info(f"Triggering {module} reminder")
-    current_time = datetime.now()
-    trigger_key = f"{module}_{current_time.minute}"
-
-    if (
-        hasattr(trigger_reminder, "last_trigger")
-        and trigger_reminder.last_trigger == trigger_key
-    ):
-        logging.debug(f"Skipping duplicate {module} reminder")
-        return
-
-    trigger_reminder.last_trigger = trigger_key
-
-    if module == "eye_relax":
-        threading.Thread(
-            target=eye_relax_reminder,
-            args=(settings["flash_frequency"], settings["relax_duration"]),
-        ).start()
-    elif module == "posture":
-        threading.Thread(
-            target=posture_reminder, args=(settings["wait_duration"],)
-        ).start()
-
+                logging.info(
+                    f"- {module} reminders at minutes: {config[module]['reminders']}"
+                )
+
+        serve_forever(
+            SOCKET_PATH,
+            functools.partial(dispatch, session),
+            functools.partial(handle_legacy_command, session),
+            on_ready=functools.partial(on_server_ready, session),
+            events=events,
+        )
+    finally:
+        scheduler.shutdown()
 
-def main():
-    if os.path.exists(SOCKET_PATH):
-        os.remove(SOCKET_PATH)
 
-    scheduler = BackgroundScheduler()
-    scheduler._logger = logging.getLogger("apscheduler")
-    scheduler._logger.setLevel(logging.WARNING)
-    scheduler.start()
+def run_shared(socket_path):
+    """Serve every user of the machine from this one process.
 
+    Meant to run as root: each user's files are accessed with their own
+    permissions and their reminders shown on the display they joined from.
+    """
+    scheduler = TriggerEngine().start()
+    manager = SessionManager(scheduler, events)
+    logging.info(f"Remind2Rest serving all users on {socket_path}")
     try:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
-            s.bind(SOCKET_PATH)
-            s.listen()
-            s.setblocking(False)
-
-            config = load_config()
-            if config is None:
-                logging.error("Error loading configuration. Exiting.")
-                return
-
-            logging.info("Remind2Rest started successfully with configuration:")
-            for module in ["eye_relax", "posture"]:
-                if config[module]["enabled"]:
-                    logging.info(
-                        f"- {module} reminders at minutes: {config[module]['reminders']}"
-                    )
-
-            schedule_reminders(scheduler, config)
-
-            while True:
-                try:
-                    conn, _ = s.accept()
-                    with conn:
-                        data = conn.recv(4096)
-                        if not data:
-                            continue
-                        try:
-                            command = data.decode()
-                            # Try to parse as JSON for custom reminders
-                            try:
-                                cmd_obj = json.loads(command)
-                                if isinstance(cmd_obj, dict) and cmd_obj.get("action") == "custom_reminder":
-                                    message = cmd_obj.get("message", "Reminder!")
-                                    flashing = bool(cmd_obj.get("flashing", False))
-                                    duration = int(cmd_obj.get("duration", 0))
-                                    cancel_key = cmd_obj.get("cancel_key", "Escape")
-                                    flashing_freq = int(cmd_obj.get("flashing_freq", 2))
-                                    initial_color = cmd_obj.get("initial_color", "black")
-                                    fontsize = int(cmd_obj.get("fontsize", 60))
-                                    threading.Thread(target=show_custom_reminder, args=(message, flashing, duration, cancel_key, flashing_freq, initial_color, fontsize)).start()
-                                    conn.sendall(b"OK")
-                                    continue
-                            except Exception:
-                                pass
-                            if command == "RELOAD":
-                                config = load_config()
-                                schedule_reminders(scheduler, config)
-                                conn.sendall(b"OK")
-                            elif command == "STATUS":
-                                conn.sendall(json.dumps(current_status).encode())
-                        except Exception as e:
-                            logging.error(f"Error handling connection: {e}")
-                except BlockingIOError:
-                    # No connection available, continue
-                    pass
-                except Exception as e:
-                    logging.error(f"Error in main loop: {str(e)}")
-
-                time.sleep(0.1)  # Short sleep to prevent CPU hogging
+        serve_forever(
+            socket_path,
+            functools.partial(dispatch_shared, manager),
+            None,
+            on_ready=lambda: manager.attach(asyncio.get_running_loop()),
+            events=events,
+            peer_credentials=True,
+            on_disconnect=manager.disconnected,
+            socket_mode=0o666,
+        )
     finally:
+        manager.close()
         scheduler.shutdown()
-        if os.path.exists(SOCKET_PATH):
-            os.remove(SOCKET_PATH)
+
+
+def join_shared(socket_path):
+    """Keep this user's session open in a shared daemon until either side exits."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    request = {
+        "id": 1,
+        "action": JOIN,
+        "display": os.environ.get("DISPLAY"),
+        "xauthority": os.environ.get("XAUTHORITY"),
+    }
+    sock.sendall(encode_frame(request))
+    buffer = b""
+    while b"\n" not in buffer:
+        more = sock.recv(4096)
+        if not more:
+            sys.exit("Shared daemon closed the connection")
+        buffer += more
+    response = decode_frame(buffer.split(b"\n", 1)[0])
+    if not response.get("ok"):
+        sys.exit(f"Cannot join shared daemon: {response.get('error')}")
+    logging.info(f"Joined shared daemon on {socket_path}")
+    # Nothing else is sent on this connection; it only marks the session open
+    while sock.recv(4096):
+        pass
+    sys.exit("Shared daemon went away")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remind2Rest reminder daemon")
+    parser.add_argument(
+        "--shared", action="store_true", help="serve all users from one process (run as root)"
+    )
+    parser.add_argument(
+        "--join", action="store_true", help="open this user's session in the shared daemon"
+    )
+    parser.add_argument("--socket", default=SHARED_SOCKET_PATH, help="shared daemon socket")
+    parser.add_argument(
+        "--log-dir", help="where to write logs (default $REMIND2REST_LOG_DIR or ~/.local/share/Remind2Rest)"
+    )
+    args = parser.parse_args()
+
+    setup_logging("Remind2Rest-join" if args.join else "Remind2Rest", args.log_dir)
+    logging.info("Remind2Rest starting up...")
+    if args.shared:
+        run_shared(args.socket)
+    elif args.join:
+        join_shared(args.socket)
+    else:
+        run_single_user()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Time to catch up on the missed runs of a fire_all custom reminder.
+
+A job repeating every minute is fired --missed runs late, and every run
+goes through a real ReminderUI dispatch queue (see catch_up_test.py, which
+checks that each one is shown). Reports the time from firing the job to
+the last overlay taking the screen.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catch_up_test import fire_missed_runs  # noqa: E402
+
+
+def measure(missed, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        shown, _ = fire_missed_runs(missed)
+        timings.append(time.perf_counter() - started)
+    return {"missed": missed, "shown": len(shown), "ms": min(timings) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--missed", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, best one counts")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [measure(missed, args.repeat) for missed in args.missed]
+    if args.json:
+        print(json.dumps(results))
+        return
+    for result in results:
+        print(f"missed {result['missed']:3d}: {result['shown']:3d} shown in {result['ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
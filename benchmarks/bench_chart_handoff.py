@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Latency and peak memory of the two chart hand-off paths.
+
+png:  3000x1800 figure -> PNG encode -> PNG decode (the old path)
+rgba: screen-sized figure -> Agg RGBA buffer -> Image.frombuffer
+
+Each path runs in its own interpreter so the peak RSS of one does not
+hide the other.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+
+def run_path(path, store_path, screen, repeat):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from PIL import Image
+
+    from chart_renderer import current_rss_bytes
+    from generate_plot import render_plot_png, render_plot_rgba
+    from ratings_store import RatingsStore
+
+    store = RatingsStore(store_path)
+    rss_before = current_rss_bytes()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if path == "png":
+            image = Image.open(BytesIO(render_plot_png(store, (3000, 1800))))
+            image.load()
+        else:
+            pixel_size, pixels = render_plot_rgba(store, screen)
+            image = Image.frombuffer("RGBA", pixel_size, pixels, "raw", "RGBA", 0, 1)
+        timings.append(time.perf_counter() - start)
+        del image
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {
+        "path": path,
+        "best_ms": min(timings) * 1000,
+        "peak_mb_over_baseline": (peak - rss_before) / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--screen", type=int, nargs=2, default=[1920, 1080])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--run-path", choices=["png", "rgba"], help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    width, height = args.screen
+    chart_size = (int(width * 0.9), int(height * 0.68))
+    if args.run_path:
+        print(json.dumps(run_path(args.run_path, args.store, chart_size, args.repeat)))
+        return
+
+    from ratings_store import RatingsStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RatingsStore(os.path.join(tmp, "posture_ratings.bin"))
+        now = int(time.time())
+        for i in range(48):
+            store.append(i % 5 + 1, now - 86400 + i * 1800)
+        for path in ("png", "rgba"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--run-path", path, "--store", store.path,
+                 "--screen", str(width), str(height), "--repeat", str(args.repeat)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{path:<5} {result['best_ms']:8.1f} ms  "
+                f"peak +{result['peak_mb_over_baseline']:6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Latency of the web configurator under concurrent load: p50/p99 per endpoint.
+
+The app is served in-process by the same server the configurator uses
+(waitress when installed, threaded Werkzeug otherwise) on a free port,
+with its config file in a temporary directory. Daemon RELOADs go to a
+socket nobody listens on, and systemctl is replaced by a fake when it is
+not installed.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import remind2rest_client  # noqa: E402
+import web_configurator  # noqa: E402
+
+CONFIG = {
+    "global_interval": 60,
+    "eye_relax": {"enabled": True, "relax_duration": 20, "flash_frequency": 1, "reminders": [0, 30]},
+    "posture": {"enabled": True, "wait_duration": 3, "history_days": 1, "reminders": [15, 45]},
+}
+
+ENDPOINTS = [
+    ("GET", "/", None),
+    ("GET", "/service_info", None),
+    ("POST", "/save_config", json.dumps(CONFIG)),
+]
+
+
+class FakeSystemctl:
+    def show(self, unit, properties):
+        return {"ActiveState": "active", "SubState": "running", "UnitFileState": "enabled"}
+
+    def run(self, action, unit):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def worker(port, method, path, body, count, latencies):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Accept-Encoding": "gzip"}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    for _ in range(count):
+        start = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 500:
+            raise RuntimeError(f"{method} {path} answered {response.status}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    web_configurator.CONFIG_PATH = os.path.join(tmp_dir, "reminder_config.json")
+    web_configurator.save_config(CONFIG)
+    remind2rest_client.get_client().socket_path = os.path.join(tmp_dir, "none.sock")
+    if shutil.which("systemctl") is None:
+        web_configurator.service_state.backend = FakeSystemctl()
+
+    port = free_port()
+    threading.Thread(
+        target=web_configurator.run_server, kwargs={"port": port}, daemon=True
+    ).start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    results = {}
+    for method, path, body in ENDPOINTS:
+        latencies = []
+        per_worker = args.requests // args.concurrency
+        threads = [
+            threading.Thread(
+                target=worker, args=(port, method, path, body, per_worker, latencies)
+            )
+            for _ in range(args.concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        results[path] = {
+            "requests": len(latencies),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "rps": round(len(latencies) / elapsed, 1),
+        }
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for path, stats in results.items():
+            print(
+                f"{path:14} p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms"
+                f"  {stats['rps']:8.1f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Before/after timing of the posture chart gradient fill on synthetic ratings."""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from matplotlib.colors import LinearSegmentedColormap  # noqa: E402
+
+from generate_plot import RATING_COLORS, generate_plot, gradient_fill  # noqa: E402
+from ratings_store import RatingsStore  # noqa: E402
+
+
+def legacy_rating_to_color(rating):
+    return LinearSegmentedColormap.from_list("custom_div_cmap", RATING_COLORS, N=4000)(
+        (rating - 0.4) / 5
+    )
+
+
+def legacy_gradient_fill(xnew, ynew):
+    verts = [
+        [
+            (xnew[i], 0),
+            (xnew[i + 1], 0),
+            (xnew[i + 1], ynew[i + 1]),
+            (xnew[i], ynew[i]),
+        ]
+        for i in range(len(xnew) - 1)
+    ]
+    colors = [legacy_rating_to_color(y) for y in ynew]
+    return verts, colors
+
+
+def write_ratings(path, count):
+    now = datetime.now()
+    step = timedelta(days=1) / (count + 1)
+    with open(path, "w") as file:
+        for i in range(count):
+            timestamp = now - timedelta(days=1) + step * (i + 1)
+            file.write(
+                f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')} - Rating: {random.randint(1, 5)}\n"
+            )
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1000, help="interpolated points")
+    parser.add_argument("--ratings", type=int, default=48, help="synthetic ratings")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    xnew = np.linspace(0, 1, args.points)
+    ynew = np.clip(3 + 2 * np.sin(np.linspace(0, 12, args.points)), 1, 5)
+
+    legacy = best_of(args.repeat, legacy_gradient_fill, xnew, ynew)
+    vectorized = best_of(args.repeat, gradient_fill, xnew, ynew)
+    print(f"gradient fill, {args.points} points")
+    print(f"  legacy:     {legacy * 1000:8.2f} ms")
+    print(f"  vectorized: {vectorized * 1000:8.2f} ms  ({legacy / vectorized:.0f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ratings_file = os.path.join(tmp, "posture_ratings.txt")
+        write_ratings(ratings_file, args.ratings)
+        store = RatingsStore(os.path.join(tmp, "posture_ratings.bin"), ratings_file)
+        full = best_of(args.repeat, generate_plot, store)
+    print(f"generate_plot, {args.ratings} ratings: {full * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
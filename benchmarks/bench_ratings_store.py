@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Last-24-hours read cost: parsing the text ratings file vs. the binary store."""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from ratings_store import RECORD_DTYPE, RatingsStore, parse_legacy_line  # noqa: E402
+
+
+def write_legacy(path, count, now):
+    # One rating every 20 minutes, ending now
+    start = now - timedelta(minutes=20 * count)
+    with open(path, "w") as file:
+        for i in range(count):
+            timestamp = start + timedelta(minutes=20 * i)
+            file.write(f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')} - Rating: {i % 5 + 1}\n")
+
+
+def write_store(path, count, now):
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    end = int(now.timestamp())
+    records["time"] = end - 1200 * np.arange(count, 0, -1)
+    records["rating"] = np.arange(count) % 5 + 1
+    records.tofile(path)
+
+
+def legacy_last_day(path, now):
+    # What generate_plot did before the binary store
+    data = {}
+    with open(path) as file:
+        for line in file:
+            epoch, rating = parse_legacy_line(line)
+            data[epoch] = rating
+    cutoff = (now - timedelta(days=1)).timestamp()
+    return [(t, r) for t, r in data.items() if t >= cutoff]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000, 5000000]
+    )
+    parser.add_argument(
+        "--legacy-max", type=int, default=1000000,
+        help="skip the text-parsing path above this many records",
+    )
+    args = parser.parse_args()
+
+    now = datetime.now()
+    print(f"{'records':>10} {'text parse ms':>14} {'store read ms':>14} {'rows':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            store_path = os.path.join(tmp, f"ratings_{count}.bin")
+            write_store(store_path, count, now)
+            store = RatingsStore(store_path)
+            start = time.perf_counter()
+            times, _ = store.read_range(start=(now - timedelta(days=1)).timestamp())
+            store_ms = (time.perf_counter() - start) * 1000
+
+            legacy_ms = float("nan")
+            if count <= args.legacy_max:
+                text_path = os.path.join(tmp, f"ratings_{count}.txt")
+                write_legacy(text_path, count, now)
+                start = time.perf_counter()
+                legacy_last_day(text_path, now)
+                legacy_ms = (time.perf_counter() - start) * 1000
+            print(f"{count:>10} {legacy_ms:>14.2f} {store_ms:>14.3f} {len(times):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Checks that the daemon's RSS stays flat while charts are rendered repeatedly.
+
+Every iteration appends a rating, so the chart cache is stale and a real
+render goes through the worker process. The daemon's RSS swings by tens
+of MB during the first worker's renders and settles after the first
+recycle, so the baseline is the peak RSS while the second worker renders.
+Exits non-zero if the peak while the last worker renders is more than
+--budget-mb above it. --leak-kb holds on to memory on every render, to
+check that a leak is caught.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_cache import ChartCache  # noqa: E402
+from chart_renderer import ChartRenderer, current_rss_bytes  # noqa: E402
+from ratings_store import RatingsStore  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=200)
+    parser.add_argument("--budget-mb", type=float, default=10.0)
+    parser.add_argument("--max-renders", type=int, default=50, help="worker recycle interval")
+    parser.add_argument("--leak-kb", type=int, default=0, help="memory to leak per render")
+    args = parser.parse_args()
+    if args.renders < 3 * args.max_renders:
+        parser.error("--renders must cover at least three workers")
+
+    leaked = []
+    # Peak RSS while each worker renders
+    peaks = [0] * ((args.renders + args.max_renders - 1) // args.max_renders)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RatingsStore(os.path.join(tmp, "posture_ratings.bin"))
+        now = int(time.time())
+        for i in range(48):
+            store.append(i % 5 + 1, now - 86400 + i * 1800)
+
+        renderer = ChartRenderer(max_renders=args.max_renders)
+        cache = ChartCache(store, renderer=renderer, cache_dir=tmp)
+        for i in range(args.renders):
+            store.append(i % 5 + 1, now + i)
+            image = cache.get()
+            assert image is not None, "render failed"
+            image.close()
+            if args.leak_kb:
+                leaked.append(b"\1" * (args.leak_kb * 1024))
+            cycle = i // args.max_renders
+            peaks[cycle] = max(peaks[cycle], current_rss_bytes())
+        renderer.close()
+
+    growth_mb = (peaks[-1] - peaks[1]) / (1024 * 1024)
+    print(
+        f"{args.renders} renders, peak RSS {peaks[1] / (1024 * 1024):.1f} MB after the "
+        f"first recycle, growth since: {growth_mb:.1f} MB"
+    )
+    if growth_mb > args.budget_mb:
+        print(f"FAIL: exceeds budget of {args.budget_mb} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Wakeups and CPU time per simulated hour: 1 Hz polling vs. deadline scheduler.
+
+Both schedulers are driven by a simulated clock, so an hour runs in well under
+a second and the numbers only reflect the scheduling work itself.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminder_schedule import ReminderSchedule  # noqa: E402
+
+MODULES = ["eye_relax", "posture"]
+
+
+def make_config(slots, interval_minutes=60):
+    minutes = [round(i * interval_minutes / slots) % interval_minutes for i in range(slots)]
+    return {
+        "global_interval": interval_minutes,
+        "eye_relax": {"enabled": True, "reminders": minutes[0::2]},
+        "posture": {"enabled": True, "reminders": minutes[1::2]},
+    }
+
+
+def polling_tick(config, interval_minutes, current_time, fired):
+    # Body of the old check_and_trigger_reminders job, minus the logging
+    elapsed_minutes = (current_time.hour * 60 + current_time.minute) % interval_minutes
+    elapsed_seconds = current_time.second
+
+    next_reminder_type = None
+    time_to_next = float("inf")
+    for module in MODULES:
+        if config[module]["enabled"]:
+            for reminder in config[module]["reminders"]:
+                time_to_reminder = (
+                    (reminder - elapsed_minutes) % interval_minutes
+                ) * 60 - elapsed_seconds
+                if 0 <= time_to_reminder < time_to_next:
+                    time_to_next = time_to_reminder
+                    next_reminder_type = module
+                if elapsed_minutes == reminder and elapsed_seconds < 1:
+                    fired.append(module)
+
+    minutes_to_next, seconds_to_next = divmod(int(time_to_next), 60)
+    return {
+        "running": True,
+        "next_reminder": next_reminder_type,
+        "time_to_next": f"{minutes_to_next:02d}:{seconds_to_next:02d}",
+        "total_interval": f"{interval_minutes:02d}",
+    }
+
+
+def run_polling(config, start, hours):
+    fired = []
+    wakeups = 0
+    cpu_start = time.process_time()
+    for second in range(int(hours * 3600)):
+        polling_tick(config, config["global_interval"], start + timedelta(seconds=second), fired)
+        wakeups += 1
+    return wakeups, time.process_time() - cpu_start, len(fired)
+
+
+def run_deadline(config, start, hours):
+    end = start + timedelta(hours=hours)
+    fired = 0
+    wakeups = 0
+    cpu_start = time.process_time()
+    schedule = ReminderSchedule(config, MODULES, start - timedelta(microseconds=1))
+    while schedule.peek()[0] < end:
+        now = schedule.peek()[0]
+        wakeups += 1
+        fired += len(schedule.pop_due(now))
+        schedule.status(now)
+    return wakeups, time.process_time() - cpu_start, fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--slots", type=int, nargs="+", default=[2, 10, 50, 500])
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    results = []
+    for slots in args.slots:
+        config = make_config(slots)
+        for name, runner in (("polling", run_polling), ("deadline", run_deadline)):
+            wakeups, cpu, fired = runner(config, start, args.hours)
+            results.append(
+                {
+                    "scheduler": name,
+                    "slots": slots,
+                    "wakeups_per_hour": wakeups / args.hours,
+                    "cpu_ms_per_hour": cpu * 1000 / args.hours,
+                    "fires": fired,
+                }
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scheduler':<10} {'slots':>6} {'wakeups/h':>10} {'cpu ms/h':>10} {'fires':>6}")
+    for r in results:
+        print(
+            f"{r['scheduler']:<10} {r['slots']:>6} {r['wakeups_per_hour']:>10.0f} "
+            f"{r['cpu_ms_per_hour']:>10.2f} {r['fires']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
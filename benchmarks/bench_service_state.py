@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""systemctl spawns per minute of configurator use, before and after ServiceState.
+
+A fake systemctl backend counts the calls that would have spawned a
+process; the page is reloaded every `--reload-every` seconds for a minute
+and the service toggled once. Time is simulated, so this runs instantly.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import service_state  # noqa: E402
+from service_state import ServiceState  # noqa: E402
+
+
+class FakeSystemctl:
+    def __init__(self):
+        self.spawns = 0
+        self.active = "active"
+
+    def show(self, unit, properties):
+        self.spawns += 1
+        return {"ActiveState": self.active, "SubState": "running", "UnitFileState": "enabled"}
+
+    def run(self, action, unit):
+        self.spawns += 1
+        if action in ("start", "stop"):
+            self.active = "active" if action == "start" else "inactive"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def legacy_spawns(seconds, reload_every, tray_interval=5):
+    # /service_info ran is-active and is-enabled, a toggle ran is-active
+    # plus the action, and the tray ran is-active every few seconds
+    page_loads = seconds // reload_every
+    return page_loads * 2 + 2 + seconds // tray_interval
+
+
+def current_spawns(seconds, reload_every, ttl):
+    backend = FakeSystemctl()
+    clock = FakeClock()
+    service_state.time = clock
+    state = ServiceState(backend=backend, ttl=ttl)
+    for second in range(seconds):
+        clock.now = float(second)
+        if second % reload_every == 0:
+            state.info()
+        if second == seconds // 2:
+            if state.is_running():
+                state.stop()
+            else:
+                state.start()
+    # The tray follows the daemon's event stream and never polls systemd
+    return backend.spawns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--reload-every", type=int, default=2)
+    parser.add_argument("--ttl", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        "legacy_spawns": legacy_spawns(args.seconds, args.reload_every),
+        "current_spawns": current_spawns(args.seconds, args.reload_every, args.ttl),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for name, value in results.items():
+            print(f"{name:16} {value:6d} per {args.seconds} s")
+
+
+if __name__ == "__main__":
+    main()
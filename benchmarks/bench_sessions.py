@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Memory and CPU of one shared daemon hosting N sessions vs N single-user daemons.
+
+Each session count runs in a fresh process that opens N headless sessions
+(config in a temporary directory, inotify watch, armed scheduler job, no
+UI) on one scheduler and event loop, then idles. The single-user figure
+is a real Remind2Rest.py started with a throwaway HOME and no display,
+measured once it answers STATUS and multiplied by N.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from chart_renderer import current_rss_bytes  # noqa: E402
+from remind2rest_client import Remind2RestClient  # noqa: E402
+
+CONFIG = {
+    "global_interval": 60,
+    "eye_relax": {"enabled": True, "relax_duration": 20, "flash_frequency": 1, "reminders": [0, 20, 40]},
+    "posture": {"enabled": True, "wait_duration": 3, "reminders": [10, 30, 50]},
+}
+
+
+def cpu_seconds(pid=None):
+    if pid is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    with open(f"/proc/{pid}/stat", "r") as file:
+        fields = file.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def rss_bytes(pid):
+    with open(f"/proc/{pid}/statm", "r") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def run_sessions(count, idle_seconds):
+    from ipc_server import EventBroadcaster
+    from sessions import Session
+    from trigger_engine import TriggerEngine
+
+    tmp_dir = tempfile.mkdtemp()
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    scheduler = TriggerEngine().start()
+    events = EventBroadcaster()
+
+    start = time.perf_counter()
+    sessions = []
+    for index in range(count):
+        config_dir = os.path.join(tmp_dir, f"user{index}")
+        os.makedirs(config_dir)
+        config_path = os.path.join(config_dir, "reminder_config.json")
+        with open(config_path, "w") as file:
+            json.dump(CONFIG, file)
+        session = Session(scheduler, config_path, events, name=f"user{index}", data_dir=config_dir)
+        if "error" in session.reload_config():
+            raise RuntimeError(f"session {index} did not load its config")
+        loop.call_soon_threadsafe(session.watch_config, loop)
+        sessions.append(session)
+    watching = threading.Event()
+    loop.call_soon_threadsafe(watching.set)
+    watching.wait()
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    cpu_before = cpu_seconds()
+    time.sleep(idle_seconds)
+    return {
+        "sessions": count,
+        "setup_ms": round(setup_ms, 1),
+        "rss_mb": round(current_rss_bytes() / 1024 / 1024, 1),
+        "idle_cpu_ms": round((cpu_seconds() - cpu_before) * 1000, 1),
+    }
+
+
+def measure_single_user(idle_seconds, timeout=30.0):
+    with tempfile.TemporaryDirectory() as home:
+        config_dir = os.path.join(home, ".config", "Remind2Rest")
+        os.makedirs(config_dir)
+        with open(os.path.join(config_dir, "reminder_config.json"), "w") as file:
+            json.dump(CONFIG, file)
+        env = dict(os.environ, HOME=home, PYTHONDONTWRITEBYTECODE="1")
+        env.pop("DISPLAY", None)
+        client = Remind2RestClient(
+            os.path.join(home, ".Remind2Rest.sock"), timeout=1.0, max_backoff=0.0
+        )
+        daemon = subprocess.Popen(
+            [sys.executable, os.path.join(repo_dir, "Remind2Rest.py")], cwd=repo_dir, env=env
+        )
+        try:
+            start = time.perf_counter()
+            while True:
+                try:
+                    client.request("STATUS")
+                    break
+                except OSError:
+                    if time.perf_counter() - start > timeout:
+                        raise RuntimeError("daemon did not answer STATUS")
+                    time.sleep(0.01)
+            # Let the background UI warm-up finish loading its modules
+            time.sleep(2.0)
+            cpu_before = cpu_seconds(daemon.pid)
+            time.sleep(idle_seconds)
+            return {
+                "rss_mb": round(rss_bytes(daemon.pid) / 1024 / 1024, 1),
+                "idle_cpu_ms": round((cpu_seconds(daemon.pid) - cpu_before) * 1000, 1),
+            }
+        finally:
+            client.close()
+            daemon.terminate()
+            daemon.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,10,100", help="comma-separated counts")
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds measured idle")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_sessions(args.child, args.idle)))
+        return
+
+    single = measure_single_user(args.idle)
+    results = {"single_user_daemon": single, "shared": []}
+    for count in [int(value) for value in args.sessions.split(",")]:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(count), "--idle", str(args.idle)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        shared = json.loads(output.strip().splitlines()[-1])
+        shared["separate_daemons_rss_mb"] = round(single["rss_mb"] * count, 1)
+        shared["separate_daemons_idle_cpu_ms"] = round(single["idle_cpu_ms"] * count, 1)
+        results["shared"].append(shared)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(
+        f"single-user daemon: {single['rss_mb']:.1f} MB RSS, "
+        f"{single['idle_cpu_ms']:.1f} ms CPU per {args.idle:g} s idle"
+    )
+    print(f"{'sessions':>8} {'shared RSS':>12} {'separate RSS':>14} {'shared CPU':>12} {'separate CPU':>14}")
+    for row in results["shared"]:
+        print(
+            f"{row['sessions']:8d} {row['rss_mb']:9.1f} MB {row['separate_daemons_rss_mb']:11.1f} MB"
+            f" {row['idle_cpu_ms']:9.1f} ms {row['separate_daemons_idle_cpu_ms']:11.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Daemon import time and time-to-first-STATUS, checked against a budget.
+
+Runs Remind2Rest.py with a throwaway HOME, so it never touches the real
+socket, config or logs. Exits non-zero if a budget is exceeded or if the
+UI/plotting stack is imported before the daemon answers STATUS.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from remind2rest_client import Remind2RestClient  # noqa: E402
+
+HEAVY_MODULES = ["tkinter", "PIL", "matplotlib", "numpy", "scipy"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import Remind2Rest
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+CONFIG = {
+    "global_interval": 60,
+    "eye_relax": {"enabled": True, "relax_duration": 20, "flash_frequency": 1, "reminders": [20, 40]},
+    "posture": {"enabled": True, "wait_duration": 3, "reminders": [0]},
+}
+
+
+def make_home(tmp):
+    config_dir = os.path.join(tmp, ".config", "Remind2Rest")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "reminder_config.json"), "w") as file:
+        json.dump(CONFIG, file)
+    env = dict(os.environ, HOME=tmp, PYTHONDONTWRITEBYTECODE="1")
+    # No display: the background UI warm-up fails quietly instead of
+    # opening windows on the developer's desktop
+    env.pop("DISPLAY", None)
+    return env
+
+
+def measure_import(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=repo_dir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_status(env, home, timeout=10.0):
+    client = Remind2RestClient(
+        os.path.join(home, ".Remind2Rest.sock"), timeout=1.0, max_backoff=0.0
+    )
+    start = time.perf_counter()
+    daemon = subprocess.Popen(
+        [sys.executable, os.path.join(repo_dir, "Remind2Rest.py")], cwd=repo_dir, env=env
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                client.request("STATUS")
+                return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.002)
+        raise RuntimeError("daemon did not answer STATUS")
+    finally:
+        client.close()
+        daemon.terminate()
+        daemon.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=300.0)
+    parser.add_argument("--status-budget-ms", type=float, default=600.0)
+    args = parser.parse_args()
+
+    import_ms, status_ms, heavy = [], [], set()
+    with tempfile.TemporaryDirectory() as home:
+        env = make_home(home)
+        # os.path.expanduser is evaluated at import time, HOME must be set first
+        for _ in range(args.runs):
+            probe = measure_import(env)
+            import_ms.append(probe["import_ms"])
+            heavy.update(probe["heavy"])
+            status_ms.append(measure_first_status(env, home))
+
+    best_import, best_status = min(import_ms), min(status_ms)
+    print(f"import Remind2Rest:   {best_import:7.1f} ms (budget {args.import_budget_ms:.0f})")
+    print(f"time to first STATUS: {best_status:7.1f} ms (budget {args.status_budget_ms:.0f})")
+    failures = []
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(sorted(heavy))}")
+    if best_import > args.import_budget_ms:
+        failures.append("import time over budget")
+    if best_status > args.status_budget_ms:
+        failures.append("time to first STATUS over budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
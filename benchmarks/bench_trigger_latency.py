@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""How late the trigger engine runs jobs, idle and with threads hogging the GIL.
+
+Jobs are scheduled back to back, each a little after the previous one
+fired, for `--seconds`. The lateness of every run (wall clock at the call
+vs. the time it was scheduled for) goes into the same histogram STATUS
+reports. Busy threads run pure-Python loops, the way a chart render or a
+JSON dump holds the GIL in the daemon.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import LatencyHistogram  # noqa: E402
+from trigger_engine import TriggerEngine  # noqa: E402
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(10000))
+
+
+def measure(seconds, period, load_threads):
+    engine = TriggerEngine().start()
+    histogram = LatencyHistogram()
+    stop = threading.Event()
+    for _ in range(load_threads):
+        threading.Thread(target=busy, args=(stop,), daemon=True).start()
+    end = time.time() + seconds
+
+    def fire(run_at):
+        histogram.record(time.time() - run_at)
+        if time.time() < end:
+            arm()
+
+    def arm():
+        run_at = time.time() + period
+        engine.schedule("bench", run_at, lambda: fire(run_at))
+
+    arm()
+    time.sleep(seconds + 0.5)
+    stop.set()
+    engine.shutdown()
+    return histogram.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--period", type=float, default=0.05, help="seconds between jobs")
+    parser.add_argument("--load", type=int, nargs="+", default=[0, 4], help="busy thread counts")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {str(load): measure(args.seconds, args.period, load) for load in args.load}
+    if args.json:
+        print(json.dumps(results))
+        return
+    for load, stats in results.items():
+        buckets = " ".join(f"<={bound}:{count}" for bound, count in stats["buckets_ms"].items() if count)
+        print(
+            f"busy threads {load:>2}: {stats['count']:4d} runs, mean {stats['mean_ms']:7.2f} ms,"
+            f" max {stats['max_ms']:7.2f} ms  [{buckets}]"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the hot paths, checked against a stored baseline.
+
+Runs headless (matplotlib's Agg backend, no display, no daemon):
+
+ratings    importing a text ratings file of 1k to 1M lines into the
+           binary store, and reading back the last day
+plot       generate_plot over the last day of those ratings
+colors     rating_to_color on one rating and on a whole array
+scheduler  cost of one scheduler tick (pop the due reminders, re-arm,
+           update the status) with 2 to 500 reminder slots
+
+Every result is a time, so lower is better. A result more than
+`--tolerance` slower than the baseline is a regression and makes the run
+exit non-zero. After an intended change, accept the new numbers with
+`--update-baseline`. Baselines are only comparable on the same machine, and
+timings on a busy machine can be far off, so compare on a quiet one.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from bench_plot import best_of, write_ratings  # noqa: E402
+from bench_scheduler import make_config, run_deadline  # noqa: E402
+from generate_plot import generate_plot, rating_to_color  # noqa: E402
+from ratings_store import DAY, RatingsStore  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SIZES = [1000, 10000, 100000, 1000000]
+QUICK_SIZES = [1000, 10000]
+SLOTS = [2, 10, 50, 500]
+PLOT_SIZE = (1600, 900)
+
+
+def bench_ratings_and_plot(sizes, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            legacy_path = os.path.join(tmp, f"ratings_{count}.txt")
+            write_ratings(legacy_path, count)
+            # Importing only happens into a missing store, so each run gets its own
+            paths = iter(os.path.join(tmp, f"ratings_{count}_{i}.bin") for i in range(repeat))
+            import_runs = repeat if count <= 100000 else 1
+            results[f"ratings.import_ms.{count}"] = best_of(
+                import_runs, lambda: RatingsStore(next(paths), legacy_path)
+            ) * 1000
+            store = RatingsStore(os.path.join(tmp, f"ratings_{count}_0.bin"))
+            end = time.time()
+            results[f"ratings.read_day_ms.{count}"] = best_of(
+                repeat, store.read_range, end - DAY, end
+            ) * 1000
+            results[f"plot.generate_ms.{count}"] = best_of(
+                repeat, generate_plot, store, PLOT_SIZE
+            ) * 1000
+    return results
+
+
+def bench_colors(repeat):
+    ratings = np.random.default_rng(0).uniform(1, 5, 1000000)
+    rating_to_color(3.0)  # builds the colormap once
+    scalar_calls = 10000
+
+    def scalar():
+        for i in range(scalar_calls):
+            rating_to_color(1 + i % 5)
+
+    return {
+        "colors.scalar_us": best_of(repeat, scalar) / scalar_calls * 1e6,
+        "colors.array_ns_per_rating": best_of(repeat, rating_to_color, ratings)
+        / len(ratings) * 1e9,
+    }
+
+
+def bench_scheduler(slots_list, repeat):
+    results = {}
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    for slots in slots_list:
+        config = make_config(slots)
+        per_tick = []
+        for _ in range(repeat):
+            wakeups, cpu, _ = run_deadline(config, start, 24)
+            per_tick.append(cpu / wakeups)
+        results[f"scheduler.tick_us.{slots}"] = min(per_tick) * 1e6
+    return results
+
+
+def run(sizes, repeat):
+    results = {}
+    results.update(bench_ratings_and_plot(sizes, repeat))
+    results.update(bench_colors(repeat))
+    results.update(bench_scheduler(SLOTS, repeat))
+    return {name: round(value, 4) for name, value in results.items()}
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (name, value, baseline value, ratio, regressed) for every result."""
+    rows = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference is None or reference <= 0:
+            rows.append((name, value, None, None, False))
+            continue
+        ratio = value / reference
+        rows.append((name, value, reference, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", help="ratings file line counts")
+    parser.add_argument("--quick", action="store_true", help=f"only sizes {QUICK_SIZES}")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, best one counts")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    report = {"environment": environment(), "results": run(sizes, args.repeat)}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        if args.json:
+            print(json.dumps(report))
+        return
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {"environment": None, "results": {}}
+        print(f"No baseline at {args.baseline}, run with --update-baseline", file=sys.stderr)
+    if baseline["environment"] not in (None, report["environment"]):
+        print(
+            f"Warning: baseline was taken on {baseline['environment']}, "
+            f"this is {report['environment']}",
+            file=sys.stderr,
+        )
+    rows = compare(report["results"], baseline["results"], args.tolerance)
+    regressions = [row for row in rows if row[4]]
+
+    if args.json:
+        report["regressions"] = [name for name, *_ in regressions]
+        print(json.dumps(report))
+    else:
+        print(f"{'benchmark':<36} {'now':>12} {'baseline':>12} {'change':>8}")
+        for name, value, reference, ratio, regressed in rows:
+            if reference is None:
+                print(f"{name:<36} {value:>12.4f} {'-':>12} {'-':>8}")
+                continue
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<36} {value:>12.4f} {reference:>12.4f} {ratio - 1:>+8.0%}{flag}")
+    if regressions:
+        print(
+            f"{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than the baseline",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
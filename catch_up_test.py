@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""A fire_all custom reminder shows every missed run, up to MAX_CATCH_UP.
+
+Runs without a display or a daemon: the overlays go through a real
+ReminderUI dispatch queue, with stand-ins for the Tk root and windows.
+Run with pytest or directly.
+"""
+
+import os
+import tempfile
+import time
+
+import notifications
+import reminder_jobs
+from ipc_server import EventBroadcaster
+from sessions import Session
+from trigger_engine import TriggerEngine
+
+
+class FakeRoot:
+    def after_idle(self, callback):
+        callback()
+
+
+class FakeWindow:
+    kind = "custom"
+
+    def __init__(self, shown):
+        self.shown = shown
+
+    def show(self, triggered_at, message, *args):
+        self.shown.append(message)
+
+
+def fire_missed_runs(missed):
+    """Fire a minute-by-minute job `missed` runs late; returns (messages shown, dispatch stats).
+
+    Every overlay is hidden as soon as it is shown, so the next can take
+    the screen.
+    """
+    shown = []
+    ui = notifications.ReminderUI()
+    ui.root = FakeRoot()
+    ui.windows = {"custom": FakeWindow(shown)}
+    ui.running = True
+    notifications._ui = ui
+    with tempfile.TemporaryDirectory() as tmp:
+        session = Session(TriggerEngine(), os.path.join(tmp, "config.json"), EventBroadcaster(), data_dir=tmp)
+        first_fire = time.time() - (missed - 0.5) * 60
+        params = reminder_jobs.custom_reminder_params({"message": "catch up"})
+        session.reminders.add("every", {"minutes": 1, "start": first_fire}, params, "fire_all", 60, first_fire)
+
+        session.fire_custom_reminders()
+        # What the Tk thread does once woken up, and after every overlay
+        ui._show_next()
+        while ui.visible is not None:
+            ui.overlay_hidden(ui.visible)
+        session.close()
+    ui.stop()
+    notifications._ui = None
+    return shown, ui.dispatch.stats()
+
+
+def test_every_missed_run_is_shown():
+    for missed in (1, 5, reminder_jobs.MAX_CATCH_UP):
+        shown, stats = fire_missed_runs(missed)
+        assert len(shown) == missed, f"{missed} missed runs, {len(shown)} shown"
+        assert stats["coalesced"] == 0
+
+
+def test_catch_up_stops_at_max():
+    shown, _ = fire_missed_runs(reminder_jobs.MAX_CATCH_UP + 15)
+    assert len(shown) == reminder_jobs.MAX_CATCH_UP
+
+
+if __name__ == "__main__":
+    test_every_missed_run_is_shown()
+    test_catch_up_stops_at_max()
+    print("OK")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import threading
+
+from PIL import Image
+
+from chart_renderer import DEFAULT_RANGE_SECONDS, DEFAULT_SIZE, ChartRenderer
+from ratings_store import DATA_DIR
+from user_identity import fs_identity
+
+CACHE_DIR = DATA_DIR
+
+
+class ChartCache:
+    """Pre-rendered posture charts, kept in memory and under CACHE_DIR.
+
+    A chart is valid for as long as the ratings store keeps the same size
+    and mtime and the same target resolution and time range are requested. Charts are kept
+    as raw RGBA pixels at screen resolution, so showing one never decodes an
+    image, and they survive a daemon restart, so even the first posture
+    reminder after boot finds a ready chart.
+
+    With `keep_in_memory` off, charts are only kept on disk, which a daemon
+    serving many users prefers. An `identity` (uid, gid) makes every file
+    access happen as that user.
+    """
+
+    def __init__(
+        self, ratings_store, renderer=None, cache_dir=CACHE_DIR, identity=None, keep_in_memory=True
+    ):
+        self.ratings_store = ratings_store
+        self.renderer = renderer if renderer is not None else ChartRenderer()
+        self.cache_dir = cache_dir
+        self.identity = identity
+        self.keep_in_memory = keep_in_memory
+        self._charts = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._worker = None
+
+    def key(self, view):
+        version = self.ratings_store.version()
+        if version is None:
+            return None
+        (width, height), range_seconds = view
+        return f"{version}-{width}x{height}-{range_seconds}"
+
+    def get(self, size=DEFAULT_SIZE, range_seconds=DEFAULT_RANGE_SECONDS):
+        """Return the chart for `size` as a PIL image, rendering it only if stale."""
+        view = (tuple(size), range_seconds)
+        key = self.key(view)
+        if key is None:
+            return None
+        chart = self._lookup(view, key)
+        if chart is None:
+            chart = self._render(view, key)
+        if chart is None:
+            return None
+        pixel_size, pixels = chart
+        # frombuffer shares the cached bytes instead of copying them
+        return Image.frombuffer("RGBA", pixel_size, pixels, "raw", "RGBA", 0, 1)
+
+    def refresh_async(self, size=DEFAULT_SIZE, range_seconds=DEFAULT_RANGE_SECONDS):
+        """Re-render the chart in the background, e.g. right after a new rating."""
+        with self._lock:
+            self._pending.add((tuple(size), range_seconds))
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._refresh_pending, name="ChartCache", daemon=True
+            )
+            self._worker.start()
+
+    def _refresh_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                view = self._pending.pop()
+            key = self.key(view)
+            if key is not None and self._lookup(view, key) is None:
+                self._render(view, key)
+
+    def _paths(self, view):
+        (width, height), range_seconds = view
+        base = os.path.join(
+            self.cache_dir, f"posture_chart_{width}x{height}_{range_seconds}s"
+        )
+        return f"{base}.rgba", f"{base}.json"
+
+    def _lookup(self, view, key):
+        with self._lock:
+            cached = self._charts.get(view)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        pixels_path, meta_path = self._paths(view)
+        try:
+            with fs_identity(self.identity):
+                with open(meta_path, "r") as file:
+                    meta = json.load(file)
+                if meta.get("key") != key:
+                    return None
+                with open(pixels_path, "rb") as file:
+                    pixels = file.read()
+            chart = ((meta["width"], meta["height"]), pixels)
+        except (OSError, KeyError, ValueError):
+            return None
+        if len(pixels) != chart[0][0] * chart[0][1] * 4:
+            return None
+        self._remember(view, key, chart)
+        return chart
+
+    def _remember(self, view, key, chart):
+        if self.keep_in_memory:
+            with self._lock:
+                self._charts[view] = (key, chart)
+
+    def _render(self, view, key):
+        size, range_seconds = view
+        chart = self.renderer.render(
+            self.ratings_store.path, size, range_seconds, identity=self.identity
+        )
+        if chart is None:
+            return None
+        self._remember(view, key, chart)
+        try:
+            with fs_identity(self.identity):
+                self._persist(view, key, chart)
+        except OSError as e:
+            logging.error(f"Error saving chart cache: {str(e)}")
+        return chart
+
+    def _persist(self, view, key, chart):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        (width, height), pixels = chart
+        pixels_path, meta_path = self._paths(view)
+        meta = json.dumps({"key": key, "width": width, "height": height})
+        for path, data, mode in ((pixels_path, pixels, "wb"), (meta_path, meta, "w")):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode) as file:
+                file.write(data)
+            os.replace(tmp_path, path)
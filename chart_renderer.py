@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+
+import metrics
+
+FIGURE_HEIGHT_INCHES = 6
+DEFAULT_SIZE = (3000, 1800)  # 10x6 inches at 300 dpi, only used without a screen size
+DEFAULT_RANGE_SECONDS = 24 * 3600
+
+script_path = os.path.realpath(__file__)
+
+RENDER_DURATION = metrics.histogram(
+    "remind2rest_chart_render_seconds",
+    "Time to draw a posture chart with generate_plot, including the round trip to the worker",
+)
+RENDERS = metrics.counter(
+    "remind2rest_chart_renders_total", "Posture charts requested, by outcome", ("outcome",)
+)
+WORKER_STARTS = metrics.counter(
+    "remind2rest_chart_worker_starts_total", "Chart worker processes started"
+)
+WORKER_RSS = metrics.gauge(
+    "remind2rest_chart_worker_rss_bytes", "Resident memory of the chart worker after its last render"
+)
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ChartRenderer:
+    """Renders posture charts in a separate worker process.
+
+    matplotlib, scipy and the figures they allocate live only in the worker,
+    so the daemon's own memory stays flat no matter how many charts are
+    drawn. The worker is replaced after `max_renders` charts or once its RSS
+    passes `max_rss_mb`, and restarted if it dies or hangs.
+    """
+
+    def __init__(self, max_renders=50, max_rss_mb=400, timeout=60):
+        self.max_renders = max_renders
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.timeout = timeout
+        self._process = None
+        self._conn = None
+        self._renders = 0
+        self._lock = threading.Lock()
+
+    def render(
+        self, store_path, size=DEFAULT_SIZE, range_seconds=DEFAULT_RANGE_SECONDS, identity=None
+    ):
+        """Render the last `range_seconds` of the ratings store at `store_path`.
+
+        Returns ((width, height), rgba_bytes) or None. The pixels travel over
+        the pipe as one raw buffer; nothing is encoded on either side. With
+        an `identity` (uid, gid) the worker reads the store as that user.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            for attempt in range(2):
+                try:
+                    (status, result, worker_rss), pixels = self._request(
+                        ("render", store_path, tuple(size), range_seconds, identity)
+                    )
+                    break
+                except (EOFError, OSError, TimeoutError) as e:
+                    logging.error(f"Chart renderer failed, restarting it: {str(e)}")
+                    self._stop()
+                    if attempt:
+                        RENDERS.inc(outcome="failed")
+                        return None
+
+            RENDER_DURATION.observe(time.perf_counter() - started)
+            WORKER_RSS.set(worker_rss)
+            self._renders += 1
+            if self._renders >= self.max_renders or worker_rss > self.max_rss_bytes:
+                logging.info(
+                    f"Recycling chart renderer after {self._renders} renders "
+                    f"({worker_rss // (1024 * 1024)} MB RSS)"
+                )
+                self._stop()
+            if status != "ok":
+                RENDERS.inc(outcome="error")
+                logging.error(f"Error generating plot: {result}")
+                return None
+            if result is None:
+                RENDERS.inc(outcome="empty")
+                return None
+            RENDERS.inc(outcome="ok")
+            return tuple(result), pixels
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def _request(self, message):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        self._conn.send(message)
+        if not self._conn.poll(self.timeout):
+            raise TimeoutError("Chart renderer did not answer in time")
+        reply = self._conn.recv()
+        pixels = None
+        if reply[0] == "ok" and reply[1] is not None:
+            pixels = self._conn.recv_bytes()
+        return reply, pixels
+
+    def _start(self):
+        parent_sock, child_sock = socket.socketpair()
+        self._process = subprocess.Popen(
+            [sys.executable, script_path, "--worker-fd", str(child_sock.fileno())],
+            pass_fds=(child_sock.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_sock.close()
+        self._conn = Connection(parent_sock.detach())
+        self._renders = 0
+        WORKER_STARTS.inc()
+
+    def _stop(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+
+
+def worker_main(fd):
+    # Only the worker pays for the plotting stack
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from generate_plot import render_plot_rgba
+    from ratings_store import RatingsStore
+
+    conn = Connection(fd)
+    own_identity = (os.geteuid(), os.getegid())
+    current_identity = own_identity
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        _, store_path, size, range_seconds, identity = message
+        try:
+            # A shared daemon's worker renders for many users; read each
+            # one's ratings with that user's permissions
+            if (identity or own_identity) != current_identity:
+                from user_identity import set_fs_identity
+
+                set_fs_identity(*(identity or own_identity))
+                current_identity = identity or own_identity
+            rendered = render_plot_rgba(RatingsStore(store_path), size, range_seconds)
+        except Exception as e:
+            conn.send(("error", str(e), current_rss_bytes()))
+            continue
+        if rendered is None:
+            conn.send(("ok", None, current_rss_bytes()))
+            continue
+        pixel_size, pixels = rendered
+        conn.send(("ok", pixel_size, current_rss_bytes()))
+        # Flatten the (height, width, 4) view so send_bytes sees every byte
+        conn.send_bytes(pixels.cast("B"))
+        del rendered, pixels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remind2Rest chart renderer worker")
+    parser.add_argument("--worker-fd", type=int, required=True)
+    worker_main(parser.parse_args().worker_fd)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; the name follows
+READ_SIZE = 16 * (EVENT.size + 256)
+
+
+class ConfigWatcher:
+    """Calls `on_change` whenever the config file is written or replaced.
+
+    The containing directory is watched with inotify rather than the file
+    itself, so editors that save through a temporary file and a rename are
+    seen too. The inotify descriptor is registered with the asyncio loop,
+    so nothing polls; a burst of events is coalesced into one call after
+    `settle_seconds`, made on a worker thread so a slow reload never holds
+    up the loop. `start` and `close` may be called from any thread.
+    """
+
+    def __init__(self, path, on_change, settle_seconds=0.2):
+        self.directory, self.name = os.path.split(os.path.abspath(path))
+        self.name = self.name.encode()
+        self.on_change = on_change
+        self.settle_seconds = settle_seconds
+        self._fd = None
+        self._loop = None
+        self._pending = None
+
+    def start(self, loop):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f"Cannot watch {self.directory}")
+        self._fd = fd
+        self._loop = loop
+        loop.call_soon_threadsafe(loop.add_reader, fd, self._on_readable)
+        logging.info(f"Watching {os.path.join(self.directory, self.name.decode())} for changes")
+
+    def close(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            # The reader and the settle timer belong to the loop's thread
+            self._loop.call_soon_threadsafe(self._close, fd)
+        except RuntimeError:
+            # The loop is already closed, and with it the reader
+            os.close(fd)
+
+    def _close(self, fd):
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self._loop.remove_reader(fd)
+        os.close(fd)
+
+    def _on_readable(self):
+        if self._fd is None:
+            return
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        touched = False
+        while offset + EVENT.size <= len(data):
+            _, _, _, name_length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            touched = touched or name == self.name
+        if touched:
+            if self._pending is not None:
+                self._pending.cancel()
+            self._pending = self._loop.call_later(self.settle_seconds, self._fire)
+
+    def _fire(self):
+        self._pending = None
+        self._loop.run_in_executor(None, self._reload)
+
+    def _reload(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            logging.error(f"Error reloading configuration: {e}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Reminders waiting for the screen.
+
+Only one reminder overlay is visible at a time; the others wait in a
+DispatchQueue, highest priority first and in arrival order within a
+priority. A reminder identical to one already waiting or on screen is
+coalesced into it. A reminder that had to make way for a more important
+one waits again, ahead of the others of its priority. Once `max_pending`
+reminders wait, the least important one is dropped, so a client flooding
+the daemon can never pile up work.
+"""
+
+import heapq
+import itertools
+
+import metrics
+
+# Lower numbers are shown first, and may take the screen from higher ones
+PRIORITY_HEALTH = 0  # the configured modules: eye relax, posture, messages
+PRIORITY_SCHEDULED = 1  # custom reminders scheduled with schedule_reminder
+PRIORITY_ADHOC = 2  # custom_reminder requests
+
+MAX_PENDING = 16
+# What may become of a reminder handed to the UI
+OUTCOMES = ("shown", "coalesced", "dropped", "preempted")
+
+DISPATCHED = metrics.counter(
+    "remind2rest_dispatch_total", "Reminders handed to the UI, by what became of them", ("outcome",)
+)
+DEPTH = metrics.gauge("remind2rest_dispatch_queue_depth", "Reminders waiting for the screen")
+
+
+class DispatchQueue:
+    """Priority queue of reminders; not thread-safe, the UI locks around it."""
+
+    def __init__(self, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self._heap = []
+        self._keys = set()
+        self._sequence = itertools.count()
+        # Re-queued reminders sort before every other one of their priority
+        self._front = itertools.count(-1, -1)
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def count(self, outcome):
+        self.counts[outcome] += 1
+        DISPATCHED.inc(outcome=outcome)
+
+    def push(self, priority, key, item, visible_key=None):
+        """Queue `item` unless `key` is already waiting or visible.
+
+        Returns what became of it: "queued", "coalesced" or "dropped".
+        """
+        if key in self._keys or key == visible_key:
+            self.count("coalesced")
+            return "coalesced"
+        return self._insert((priority, next(self._sequence), key, item))
+
+    def requeue(self, priority, key, item):
+        """Queue a reminder taken off the screen again, first in line among its priority."""
+        return self._insert((priority, next(self._front), key, item))
+
+    def _insert(self, entry):
+        if len(self._heap) >= self.max_pending:
+            worst = max(self._heap)
+            if entry > worst:
+                self.count("dropped")
+                return "dropped"
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self._keys.discard(worst[2])
+            DEPTH.inc(-1)
+            self.count("dropped")
+        heapq.heappush(self._heap, entry)
+        self._keys.add(entry[2])
+        DEPTH.inc()
+        return "queued"
+
+    def peek_priority(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self):
+        """(priority, key, item) of the next reminder to show."""
+        priority, _, key, item = heapq.heappop(self._heap)
+        self._keys.discard(key)
+        DEPTH.inc(-1)
+        self.count("shown")
+        return priority, key, item
+
+    def stats(self):
+        return dict(self.counts, depth=len(self._heap))
+
+    @staticmethod
+    def empty_stats():
+        """What `stats` reports for a queue that never saw a reminder."""
+        return dict.fromkeys(OUTCOMES, 0) | {"depth": 0}
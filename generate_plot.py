@@ -1,113 +1,182 @@
 #!/usr/bin/env python3
 
 import os
-from datetime import timedelta, datetime
+from datetime import datetime
 import numpy as np
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from scipy.interpolate import Akima1DInterpolator
 from io import BytesIO
 from PIL import Image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.collections import PolyCollection
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
 import logging
+from chart_renderer import DEFAULT_SIZE, FIGURE_HEIGHT_INCHES
+from ratings_store import DAY, ROLLUP_TIERS, RatingsStore, bucket_start
+
+
+# About one plotted point per this many horizontal pixels
+PIXELS_PER_POINT = 8
+
+RATING_COLORS = [
+    (1, 0, 0),  # Red
+    (1, 0.5, 0),  # Orange
+    (1, 1, 0),  # Yellow
+    (0, 1, 0),  # Green
+    (0, 0, 1),  # Blue
+]
+
+_rating_cmap = None
+
+
+def get_rating_cmap():
+    global _rating_cmap
+    if _rating_cmap is None:
+        _rating_cmap = LinearSegmentedColormap.from_list(
+            "custom_div_cmap", RATING_COLORS, N=4000
+        )
+    return _rating_cmap
 
 
 def rating_to_color(rating):
-    colors = [
-        (1, 0, 0),  # Red
-        (1, 0.5, 0),  # Orange
-        (1, 1, 0),  # Yellow
-        (0, 1, 0),  # Green
-        (0, 0, 1),  # Blue
-    ]
-    return LinearSegmentedColormap.from_list("custom_div_cmap", colors, N=4000)(
-        (rating - 0.4) / 5
-    )
-
-
-def generate_plot(ratings_file):
-    try:
-        if not os.path.exists(ratings_file):
-            logging.warning("Ratings file does not exist.")
-            return None
+    # Works on a single rating or a whole array of them in one lookup
+    return get_rating_cmap()((rating - 0.4) / 5)
+
+
+def gradient_fill(xnew, ynew):
+    """Quadrilaterals under the curve and their colors, built as whole arrays."""
+    verts = np.empty((len(xnew) - 1, 4, 2))
+    verts[:, 0, 0] = xnew[:-1]
+    verts[:, 0, 1] = 0
+    verts[:, 1, 0] = xnew[1:]
+    verts[:, 1, 1] = 0
+    verts[:, 2, 0] = xnew[1:]
+    verts[:, 2, 1] = ynew[1:]
+    verts[:, 3, 0] = xnew[:-1]
+    verts[:, 3, 1] = ynew[:-1]
+    return verts, rating_to_color(ynew[:-1])
+
+
+def load_series(ratings_store, start, end, width_px):
+    """Ratings between start and end at the coarsest resolution that fills the width.
+
+    Rollup tiers are tried from weekly down to hourly; the first one with at
+    least one bucket per PIXELS_PER_POINT pixels is plotted as bucket means,
+    otherwise the raw ratings are used. A year of history thus costs about
+    as many points as a single day.
+    """
+    wanted = max(2, width_px // PIXELS_PER_POINT)
+    for tier in ("weekly", "daily", "hourly"):
+        seconds = ROLLUP_TIERS[tier]
+        if (end - start) / seconds >= wanted:
+            buckets = ratings_store.read_rollup(tier, bucket_start(start, seconds), end)
+            centers = buckets["start"] + seconds // 2
+            return centers, buckets["sum"] / np.maximum(buckets["count"], 1)
+
+    epochs, ratings = ratings_store.read_range(start, end)
+    # Keep the last rating recorded for any given second
+    epochs, first_of_reversed = np.unique(epochs[::-1], return_index=True)
+    return epochs, ratings[::-1][first_of_reversed].astype(float)
+
+
+def draw_chart(ratings_store, size=DEFAULT_SIZE, range_seconds=DAY):
+    """Draw the last `range_seconds` of ratings on a figure of `size` (width, height) pixels.
+
+    Returns the Figure with its Agg canvas already rendered, or None when
+    there is not enough data.
+    """
+    end = datetime.now().timestamp()
+    epochs, ratings = load_series(ratings_store, end - range_seconds, end, size[0])
+
+    if len(epochs) < 2:
+        logging.warning("Insufficient data for the selected range to generate a plot.")
+        return None
 
-        data_dict = {}
-        with open(ratings_file, "r") as file:
-            for line in file:
-                try:
-                    time_str, rating_str = line.strip().split(" - Rating: ")
-                    timestamp = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                    data_dict[timestamp] = int(rating_str)
-                except ValueError as e:
-                    logging.error(
-                        f"Error parsing line in ratings file: {line}. Error: {str(e)}"
-                    )
-
-        if len(data_dict) < 2:
-            logging.warning("Insufficient data to generate a plot.")
-            return None
+    times = [datetime.fromtimestamp(int(epoch)) for epoch in epochs]
+    time_nums = mdates.date2num(times)
+
+    akima = Akima1DInterpolator(time_nums, ratings)
+    xnew = np.linspace(min(time_nums), max(time_nums), 1000)
+    ynew = np.clip(akima(xnew), 1, 5)
+
+    verts, colors = gradient_fill(xnew, ynew)
+    poly = PolyCollection(verts, facecolors=colors)
+
+    # A standalone Figure instead of pyplot: no global state shared between
+    # callers, and the figure is freed as soon as it goes out of scope.
+    # The layout is always 6 inches tall; the dpi scales it to the target.
+    width, height = size
+    dpi = height / FIGURE_HEIGHT_INCHES
+    fig = Figure(figsize=(width / dpi, FIGURE_HEIGHT_INCHES), dpi=dpi, frameon=False)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.xaxis.set_major_locator(MaxNLocator(15))
+    ax.scatter(time_nums, ratings, color="white", s=20)
+    ax.add_collection(poly)
+    ax.plot(xnew, ynew, color="white", linewidth=1)
+    ax.set_xlim(min(xnew), max(xnew))
+    ax.set_ylim(0, 5.1)
+    ax.set_ylabel("Rating", color="white", fontsize=20)
+    ax.set_title("Ratings Over Time", color="white", fontsize=24)
+    if range_seconds <= 2 * DAY:
+        date_format = "%H:%M"
+    elif range_seconds <= 90 * DAY:
+        date_format = "%b %d"
+    else:
+        date_format = "%b %Y"
+    ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    ax.tick_params(axis="both", colors="white", labelsize=16)
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.patch.set_facecolor("none")
+    canvas.draw()
+    return fig
 
-        current_time = datetime.now()
-        one_day_ago = current_time - timedelta(days=1)
-        filtered_data = [
-            (time, rating) for time, rating in data_dict.items() if time >= one_day_ago
-        ]
 
-        if len(filtered_data) < 2:
-            logging.warning(
-                "Insufficient data for the last 24 hours to generate a plot."
-            )
+def render_plot_rgba(ratings_store, size=DEFAULT_SIZE, range_seconds=DAY):
+    """Render the chart as raw RGBA pixels, without any image encoding.
+
+    Returns ((width, height), buffer) where buffer is a memoryview on the
+    Agg renderer's own pixel memory, or None.
+    """
+    try:
+        fig = draw_chart(ratings_store, size, range_seconds)
+        if fig is None:
             return None
+        return fig.canvas.get_width_height(), fig.canvas.buffer_rgba()
+    except Exception as e:
+        logging.error(f"Error generating plot: {str(e)}")
+        return None
 
-        times, ratings = zip(*filtered_data)
-        time_nums = mdates.date2num(times)
-
-        akima = Akima1DInterpolator(time_nums, ratings)
-        xnew = np.linspace(min(time_nums), max(time_nums), 1000)
-        ynew = np.clip(akima(xnew), 1, 5)
-
-        verts = [
-            [
-                (xnew[i], 0),
-                (xnew[i + 1], 0),
-                (xnew[i + 1], ynew[i + 1]),
-                (xnew[i], ynew[i]),
-            ]
-            for i in range(len(xnew) - 1)
-        ]
-
-        colors = [rating_to_color(y) for y in ynew]
-        poly = PolyCollection(verts, facecolors=colors)
-
-        fig, ax = plt.subplots(figsize=(10, 6), frameon=False)
-        ax.xaxis.set_major_locator(plt.MaxNLocator(15))
-        ax.scatter(time_nums, ratings, color="white", s=20)
-        ax.add_collection(poly)
-        ax.plot(xnew, ynew, color="white", linewidth=1)
-        ax.set_xlim(min(xnew), max(xnew))
-        ax.set_ylim(0, 5.1)
-        ax.set_ylabel("Rating", color="white", fontsize=20)
-        ax.set_title("Ratings Over Time", color="white", fontsize=24)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        ax.tick_params(axis="both", colors="white", labelsize=16)
-        plt.xticks(rotation=45)
-        plt.gca().patch.set_facecolor("none")
 
+def render_plot_png(ratings_store, size=DEFAULT_SIZE, range_seconds=DAY):
+    """Render the chart as PNG bytes."""
+    try:
+        fig = draw_chart(ratings_store, size, range_seconds)
+        if fig is None:
+            return None
         buf = BytesIO()
-        plt.savefig(buf, format="png", dpi=300)
-        buf.seek(0)
-        return Image.open(buf)
+        fig.savefig(buf, format="png", dpi=fig.dpi)
+        return buf.getvalue()
     except Exception as e:
         logging.error(f"Error generating plot: {str(e)}")
         return None
 
 
+def generate_plot(ratings_store, size=DEFAULT_SIZE, range_seconds=DAY):
+    rendered = render_plot_rgba(ratings_store, size, range_seconds)
+    if rendered is None:
+        return None
+    pixel_size, pixels = rendered
+    return Image.frombuffer("RGBA", pixel_size, pixels, "raw", "RGBA", 0, 1)
+
+
 if __name__ == "__main__":
     # For testing purposes
     script_dir = os.path.dirname(os.path.realpath(__file__))
     ratings_file_path = os.path.join(script_dir, "posture_ratings.txt")
-    img = generate_plot(ratings_file_path)
+    img = generate_plot(RatingsStore(legacy_path=ratings_file_path))
     if img:
         img.show()
     else:
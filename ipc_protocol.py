@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Wire format of the ~/.Remind2Rest.sock control socket.
+
+Every message is one JSON object terminated by a newline. Requests carry an
+"id" and an "action" plus the action's parameters:
+
+    {"id": 1, "action": "STATUS"}
+    {"id": 2, "action": "custom_reminder", "message": "Drink water!"}
+
+and each response echoes the id:
+
+    {"id": 1, "ok": true, "result": {...}}
+    {"id": 2, "ok": false, "error": "..."}
+
+Custom reminders can also be scheduled for later, once ("at": epoch seconds
+or ISO time), every N minutes ("every") or on a crontab line ("cron"),
+with a "misfire" policy for runs missed while the daemon was down:
+
+    {"id": 3, "action": "schedule_reminder", "cron": "0 12 * * 1-5", "message": "Lunch!"}
+    {"id": 4, "action": "list_reminders"}
+    {"id": 5, "action": "cancel_reminder", "reminder_id": 1}
+
+custom_reminder requests are rate limited per user and, like every
+reminder, wait for the screen if another one is shown.
+
+A client may send any number of requests on one connection without waiting
+for the replies; responses come back in request order.
+
+After a SUBSCRIBE request the daemon also pushes event frames on that
+connection whenever its state changes. They carry no id:
+
+    {"event": "next_changed", "data": {...}}
+
+so subscriptions are best kept on a connection of their own.
+
+METRICS returns the daemon's counters, gauges and latency histograms, as
+described in metrics.py.
+
+A shared daemon serving many users listens on SHARED_SOCKET_PATH instead
+and tells its clients apart by their Unix credentials. A user's session
+exists for as long as some connection that sent JOIN stays open:
+
+    {"id": 1, "action": "JOIN", "display": ":1", "xauthority": "..."}
+
+Every other request acts on the session of the connecting user.
+"""
+
+import json
+import os
+
+SOCKET_PATH = os.path.expanduser("~/.Remind2Rest.sock")
+SHARED_SOCKET_PATH = "/run/remind2rest.sock"
+
+# Upper bound for a single frame, to keep a misbehaving client from making the
+# daemon buffer without limit
+MAX_FRAME_SIZE = 1024 * 1024
+
+SUBSCRIBE = "SUBSCRIBE"
+JOIN = "JOIN"
+
+
+def default_socket_path():
+    """The user's own daemon if one is running, else a shared daemon if there is one."""
+    if not os.path.exists(SOCKET_PATH) and os.path.exists(SHARED_SOCKET_PATH):
+        return SHARED_SOCKET_PATH
+    return SOCKET_PATH
+
+
+def encode_frame(message):
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_frame(line):
+    message = json.loads(line.decode())
+    if not isinstance(message, dict):
+        raise ValueError("Frame is not a JSON object")
+    return message
+
+
+def split_frames(buffer):
+    """Split complete frames off `buffer`; returns (frames, remaining_bytes)."""
+    *frames, remaining = buffer.split(b"\n")
+    return [frame for frame in frames if frame.strip()], remaining
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import time
+
+import metrics
+from ipc_protocol import (
+    MAX_FRAME_SIZE,
+    SUBSCRIBE,
+    decode_frame,
+    encode_frame,
+    split_frames,
+)
+
+READ_CHUNK = 65536
+
+# Requests that only read in-memory state are answered on the event loop
+# itself; every other one runs on one of DISPATCH_WORKERS threads, so a slow
+# handler (a database commit, starting the UI, opening a session) never
+# holds up the other clients
+INLINE_ACTIONS = frozenset({"STATUS", "METRICS", SUBSCRIBE})
+DISPATCH_WORKERS = 4
+
+
+# The connecting process as reported by the kernel; `connection` tells apart
+# several connections of the same process
+Peer = collections.namedtuple("Peer", "pid uid gid connection")
+_connection_ids = itertools.count(1)
+
+REQUEST_DURATION = metrics.histogram(
+    "remind2rest_ipc_request_seconds", "Time to answer a socket request, by action", ("action",)
+)
+REQUEST_ERRORS = metrics.counter(
+    "remind2rest_ipc_errors_total", "Socket requests answered with an error, by action", ("action",)
+)
+CONNECTIONS = metrics.gauge("remind2rest_ipc_connections", "Open socket connections")
+
+
+def peer_credentials(writer):
+    sock = writer.get_extra_info("socket")
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    pid, uid, gid = struct.unpack("3i", creds)
+    return Peer(pid, uid, gid, next(_connection_ids))
+
+
+class EventBroadcaster:
+    """Pushes event frames to every connection that sent SUBSCRIBE.
+
+    `publish` may be called from any thread; the frames are written by the
+    server's event loop. A subscriber that stops reading is dropped once
+    its unsent data passes MAX_FRAME_SIZE. Events published with a `topic`
+    only reach the subscribers of that topic and those without one.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._writers = {}
+
+    def publish(self, event, data=None, topic=None):
+        if self._loop is None or self._loop.is_closed():
+            return
+        frame = encode_frame({"event": event, "data": data})
+        self._loop.call_soon_threadsafe(self._broadcast, frame, topic)
+
+    def _attach(self, loop):
+        self._loop = loop
+
+    def _add(self, writer, topic=None):
+        self._writers[writer] = topic
+
+    def _remove(self, writer):
+        self._writers.pop(writer, None)
+
+    def _broadcast(self, frame, topic):
+        for writer, writer_topic in list(self._writers.items()):
+            if topic is not None and writer_topic not in (None, topic):
+                continue
+            if writer.is_closing():
+                self._remove(writer)
+            elif writer.transport.get_write_buffer_size() > MAX_FRAME_SIZE:
+                logging.warning("Dropping event subscriber that stopped reading")
+                self._remove(writer)
+                writer.close()
+            else:
+                writer.write(frame)
+
+
+def _is_legacy(buffer):
+    """Whether a connection that sent `buffer` first is an unframed client; None if undecided.
+
+    Clients written before the framed protocol send one unterminated
+    command: a bare command name, or a single JSON object. A frame is a
+    JSON object followed by a newline, so input that does not start with
+    one is legacy, and so is a complete JSON object with no newline after it.
+    """
+    if b"\n" in buffer:
+        return False
+    if not buffer.lstrip().startswith(b"{"):
+        return True
+    try:
+        json.loads(buffer)
+    except ValueError:
+        # Part of a longer frame, or of a JSON command still arriving
+        return None
+    return True
+
+
+def _dispatch(request, dispatch, peer):
+    return dispatch(request) if peer is None else dispatch(request, peer)
+
+
+async def _process_frame(line, dispatch, peer, executor):
+    """Returns (action, response) for one request frame."""
+    request_id = None
+    action = None
+    started = time.perf_counter()
+    try:
+        request = decode_frame(line)
+        request_id = request.get("id")
+        action = request.get("action")
+        if action in INLINE_ACTIONS:
+            result = _dispatch(request, dispatch, peer)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor, _dispatch, request, dispatch, peer
+            )
+        response = {"id": request_id, "ok": True, "result": result}
+    except Exception as e:
+        logging.error(f"Error handling request {request_id}: {e}")
+        REQUEST_ERRORS.inc(action=action)
+        response = {"id": request_id, "ok": False, "error": str(e)}
+    REQUEST_DURATION.observe(time.perf_counter() - started, action=action)
+    return action, response
+
+
+async def _serve_legacy(buffer, writer, handle_legacy, executor):
+    reply = await asyncio.get_running_loop().run_in_executor(
+        executor, handle_legacy, buffer.decode()
+    )
+    if reply is not None:
+        writer.write(reply)
+        await writer.drain()
+
+
+async def _serve_framed(buffer, reader, writer, dispatch, events, peer, executor):
+    while True:
+        frames, buffer = split_frames(buffer)
+        for line in frames:
+            # One request at a time per connection, so replies keep their order
+            action, response = await _process_frame(line, dispatch, peer, executor)
+            writer.write(encode_frame(response))
+            if action == SUBSCRIBE and response["ok"] and events is not None:
+                events._add(writer, None if peer is None else peer.uid)
+        await writer.drain()
+        if len(buffer) > MAX_FRAME_SIZE:
+            writer.write(
+                encode_frame({"id": None, "ok": False, "error": "Frame too large"})
+            )
+            await writer.drain()
+            return
+        more = await reader.read(READ_CHUNK)
+        if not more:
+            return
+        buffer += more
+
+
+async def _handle_client(reader, writer, dispatch, handle_legacy, events, options):
+    peer = None
+    CONNECTIONS.inc()
+    try:
+        if options.get("peer_credentials"):
+            peer = peer_credentials(writer)
+        buffer = await reader.read(READ_CHUNK)
+        legacy = _is_legacy(buffer)
+        while legacy is None and len(buffer) < MAX_FRAME_SIZE:
+            more = await reader.read(READ_CHUNK)
+            if not more:
+                break
+            buffer += more
+            legacy = _is_legacy(buffer)
+        if not buffer:
+            return
+        # Undecided input that stopped or grew too large is no frame either
+        if legacy is not False:
+            if handle_legacy is not None:
+                await _serve_legacy(buffer, writer, handle_legacy, options["executor"])
+            return
+        await _serve_framed(
+            buffer, reader, writer, dispatch, events, peer, options["executor"]
+        )
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+    except Exception as e:
+        logging.error(f"Error handling connection: {e}")
+    finally:
+        CONNECTIONS.inc(-1)
+        if events is not None:
+            events._remove(writer)
+        writer.close()
+        on_disconnect = options.get("on_disconnect")
+        if peer is not None and on_disconnect is not None:
+            try:
+                # Closing a session may wait for its UI thread to end
+                await asyncio.get_running_loop().run_in_executor(
+                    options["executor"], on_disconnect, peer
+                )
+            except Exception as e:
+                logging.error(f"Error closing connection of pid {peer.pid}: {e}")
+
+
+async def _serve(socket_path, dispatch, handle_legacy, on_ready, events, options):
+    if events is not None:
+        events._attach(asyncio.get_running_loop())
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: _handle_client(
+            reader, writer, dispatch, handle_legacy, events, options
+        ),
+        path=socket_path,
+    )
+    if options.get("socket_mode") is not None:
+        os.chmod(socket_path, options["socket_mode"])
+    if on_ready is not None:
+        on_ready()
+    async with server:
+        await server.serve_forever()
+
+
+def serve_forever(
+    socket_path,
+    dispatch,
+    handle_legacy,
+    on_ready=None,
+    events=None,
+    peer_credentials=False,
+    on_disconnect=None,
+    socket_mode=None,
+):
+    """Serve commands on a Unix socket until interrupted.
+
+    Every client gets its own coroutine on a single epoll-backed event loop,
+    so the process sleeps until a connection or data actually arrives and a
+    slow client never holds up the others. `dispatch` receives a decoded
+    request dict and returns its result; `handle_legacy` receives the raw
+    command string of an unframed client and returns the reply bytes, or
+    None to send nothing. Both are called on worker threads, apart from
+    INLINE_ACTIONS, and must be thread-safe. `on_ready` is called once the socket is listening.
+    Connections that SUBSCRIBE receive whatever is published on `events`,
+    an EventBroadcaster.
+
+    With `peer_credentials`, each connection's pid/uid/gid is taken from
+    SO_PEERCRED and `dispatch` is called as dispatch(request, peer); the
+    peer's uid is then its event topic, and `on_disconnect(peer)` is called
+    on a worker thread when the connection closes. `handle_legacy` may be None to refuse
+    unframed clients, and `socket_mode` sets the socket file's permissions.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(
+        DISPATCH_WORKERS, thread_name_prefix="Dispatch"
+    )
+    options = {
+        "peer_credentials": peer_credentials,
+        "on_disconnect": on_disconnect,
+        "socket_mode": socket_mode,
+        "executor": executor,
+    }
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    try:
+        asyncio.run(_serve(socket_path, dispatch, handle_legacy, on_ready, events, options))
+    finally:
+        executor.shutdown(wait=False)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""One logging pipeline per process, which never blocks the code that logs.
+
+A call to `logging.info` and friends only puts the record on a bounded
+queue; a single writer thread formats it and writes it to
+LOG_DIR/<name>.log, one JSON object per line:
+
+    {"time": "...", "level": "INFO", "logger": "root", "thread": "Trigger_0",
+     "message": "Triggering posture reminder", "reminder": "posture", "late": 0.002}
+
+Values passed with `extra=` become fields of their own. When the queue is
+full the record is dropped rather than waited for. Every call site may log
+a burst of RATE_BURST records and then RATE_PER_SECOND a second; past that
+only every SAMPLE_EVERY-th record is written, with the number suppressed
+since the last one written. Dropped records are counted in the metrics.
+
+All processes log under LOG_DIR, which the REMIND2REST_LOG_DIR
+environment variable overrides.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import metrics
+from rate_limit import TokenBucket
+
+LOG_DIR = os.environ.get("REMIND2REST_LOG_DIR") or os.path.expanduser(
+    "~/.local/share/Remind2Rest"
+)
+QUEUE_SIZE = 10000
+RATE_PER_SECOND = 1.0
+RATE_BURST = 20
+SAMPLE_EVERY = 100
+
+DROPPED = metrics.counter(
+    "remind2rest_log_records_dropped_total", "Log records that were not written, by reason", ("reason",)
+)
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message"}
+
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Limits how often each call site logs; see the module docstring."""
+
+    def __init__(self, rate=RATE_PER_SECOND, burst=RATE_BURST, sample_every=SAMPLE_EVERY):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_every = sample_every
+        # (file, line) -> [bucket, records over the limit since the last one written]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [TokenBucket(self.rate, self.burst), 0]
+            if site[0].take():
+                suppressed = site[1]
+            else:
+                site[1] += 1
+                if site[1] % self.sample_every:
+                    DROPPED.inc(reason="rate_limited")
+                    return False
+                suppressed = site[1] - 1
+                record.sampled = True
+            site[1] = 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Resolve the message here, in the caller's thread: its arguments may
+        # change once the caller moves on
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc(reason="queue_full")
+
+
+def setup_logging(name, log_dir=None, level=logging.INFO, console=False):
+    """Route this process's logging through the pipeline; returns the log file's path.
+
+    With `console`, warnings and errors are also printed to stderr.
+    """
+    global _listener
+    log_dir = log_dir or LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"{name}.log")
+
+    file_handler = RotatingFileHandler(
+        path,
+        maxBytes=1024 * 1024,  # 1MB per file
+        backupCount=3,  # Keep 3 backup files
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(StructuredFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.WARNING)
+        console_handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+        handlers.append(console_handler)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(QUEUE_SIZE))
+    queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return path
+
+
+def shutdown_logging():
+    """Write out everything still queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
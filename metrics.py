@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Counters, gauges and latency histograms of the running daemon.
+
+Metrics are registered once, at import time of the module they measure,
+and updated from any thread. `snapshot()` is what the METRICS command
+returns; `prometheus_text()` turns a snapshot into the Prometheus text
+exposition format, which is what the web configurator serves at /metrics.
+Nothing here imports more than the standard library, so measuring costs
+the daemon no startup time.
+"""
+
+import math
+import threading
+
+# Upper bounds, in milliseconds, of every latency histogram's buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 60000)
+
+# A metric keeps at most this many label combinations; further ones are
+# counted under the label value "other"
+MAX_LABEL_SETS = 64
+
+
+class LatencyHistogram:
+    """Counts of how late things happened, in fixed buckets up to LATENCY_BUCKETS_MS."""
+
+    def __init__(self):
+        self._counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        latency_ms = max(0.0, seconds * 1000)
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound),
+            len(LATENCY_BUCKETS_MS),
+        )
+        with self._lock:
+            self._counts[bucket] += 1
+            self._count += 1
+            self._total += latency_ms
+            self._max = max(self._max, latency_ms)
+
+    def stats(self):
+        with self._lock:
+            counts = list(self._counts)
+            count, total, max_ms = self._count, self._total, self._max
+        labels = [str(bound) for bound in LATENCY_BUCKETS_MS] + ["+Inf"]
+        return {
+            "count": count,
+            "sum_ms": round(total, 3),
+            "mean_ms": round(total / count, 2) if count else None,
+            "max_ms": round(max_ms, 2),
+            "buckets_ms": dict(zip(labels, counts)),
+        }
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.labels:
+            # Reported as zero from the start rather than missing
+            self._values[()] = self._zero()
+
+    def _zero(self):
+        return 0
+
+    def _key(self, labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        if key not in self._values and len(self._values) >= MAX_LABEL_SETS:
+            key = ("other",) * len(self.labels)
+        return key
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            {"labels": dict(zip(self.labels, key)), "value": self._export(value)}
+            for key, value in values
+        ]
+
+    def _export(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that is set, or read from `func` whenever a snapshot is taken."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labels=(), func=None):
+        super().__init__(name, help, labels)
+        self.func = func
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        if self.func is not None:
+            return [{"labels": {}, "value": self.func()}]
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def _zero(self):
+        return LatencyHistogram()
+
+    def observe(self, seconds, **labels):
+        with self._lock:
+            key = self._key(labels)
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def _export(self, histogram):
+        return histogram.stats()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        # Registering a name twice returns the first metric, so a module
+        # that is imported again keeps counting where it was
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), func=None):
+        return self._register(Gauge(name, help, labels, func))
+
+    def histogram(self, name, help, labels=()):
+        return self._register(Histogram(name, help, labels))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                # A gauge whose source cannot be read is left out of this one
+                continue
+            snapshot[metric.name] = {"type": metric.type, "help": metric.help, "samples": samples}
+        return snapshot
+
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+snapshot = registry.snapshot
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(snapshot):
+    """The Prometheus text format (version 0.0.4) of a metrics snapshot.
+
+    Histograms are recorded in milliseconds and exported in seconds, as
+    Prometheus expects.
+    """
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        help = metric.get("help", "").replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric["samples"]:
+            labels, value = sample["labels"], sample["value"]
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in value["buckets_ms"].items():
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(float(bound) / 1000)
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum_ms'] / 1000)}")
+            lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
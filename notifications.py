@@ -1,192 +1,574 @@
 #!/usr/bin/env python3
 import tkinter as tk
-from datetime import datetime
+from collections import deque
 import os
-from PIL import Image, ImageTk
-import matplotlib
-matplotlib.use('Agg')
-from generate_plot import generate_plot
+import threading
+import time
+from PIL import ImageTk
+from chart_cache import ChartCache
+from chart_renderer import DEFAULT_RANGE_SECONDS, DEFAULT_SIZE
+from dispatch_queue import PRIORITY_ADHOC, PRIORITY_HEALTH, DispatchQueue
+import metrics
+from rate_limit import Backoff
+from ratings_store import RatingsStore
 import logging
 
-# Set up logging
-logging.basicConfig(filename='notifications.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
 # Variables for file paths
 script_dir = os.path.dirname(os.path.realpath(__file__))
 ratings_file_path = os.path.join(script_dir, 'posture_ratings.txt')
 
-def eye_relax_reminder(flash_frequency, relax_duration):
-    print(f"Debug: eye_relax_reminder called with flash_frequency={flash_frequency}, relax_duration={relax_duration}")  # Debug print
-    logging.info(f"eye_relax_reminder called with flash_frequency={flash_frequency}, relax_duration={relax_duration}")
-    try:
-        relax_win = tk.Tk()
-        relax_win.attributes('-fullscreen', True)
-        relax_win.attributes('-topmost', True)
-        relax_win.focus_set()
-
-        flash_interval = round(1000 / flash_frequency) if flash_frequency > 0 else 10000
+# XAUTHORITY is read from the environment while Tk connects to the display,
+# so UIs for different users are created one at a time. Each display has at
+# most one UI, which owns it from connecting until its Tk thread ends.
+_display_lock = threading.Lock()
+_display_owners = {}
+
+FIRST_FRAME = metrics.histogram(
+    "remind2rest_ui_first_frame_seconds",
+    "Time from a reminder being triggered to its window's first frame",
+    ("kind",),
+)
+TK_ROOTS = metrics.gauge("remind2rest_tk_roots", "Running reminder UIs, each with its own Tk root")
+
+
+class LatencyRecorder:
+    """Recent trigger-to-first-frame latencies, per reminder kind."""
+
+    def __init__(self, size=256):
+        self._size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self._size)).append(seconds * 1000)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {kind: sorted(samples) for kind, samples in self._samples.items()}
+        return {
+            kind: {
+                "count": len(samples),
+                "p50_ms": round(samples[len(samples) // 2], 2),
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+                "max_ms": round(samples[-1], 2),
+            }
+            for kind, samples in snapshot.items()
+        }
+
+
+class OverlayWindow:
+    """A fullscreen topmost window that is built once and then only shown and hidden."""
+
+    kind = None
+
+    def __init__(self, ui):
+        self.ui = ui
+        self.win = tk.Toplevel(ui.root)
+        self.win.withdraw()
+        self.win.protocol('WM_DELETE_WINDOW', self.hide)
+        self.win.bind('<Expose>', self._on_expose)
+        self._timers = {}
+        self._triggered_at = None
+
+    def after(self, name, delay_ms, callback, *args):
+        # Named timers: re-arming a name replaces the pending callback
+        self.cancel(name)
+        self._timers[name] = self.win.after(delay_ms, self._run_timer, name, callback, *args)
+
+    def cancel(self, name):
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            self.win.after_cancel(timer)
+
+    def _run_timer(self, name, callback, *args):
+        self._timers.pop(name, None)
+        callback(*args)
+
+    def present(self, triggered_at):
+        self._triggered_at = triggered_at
+        self.win.attributes('-fullscreen', True)
+        self.win.attributes('-topmost', True)
+        self.win.deiconify()
+        self.win.focus_force()
+
+    def hide(self, event=None):
+        for name in list(self._timers):
+            self.cancel(name)
+        self._triggered_at = None
+        self.win.withdraw()
+        self.ui.overlay_hidden(self)
+
+    def _on_expose(self, event):
+        if event.widget is not self.win or self._triggered_at is None:
+            return
+        latency = time.perf_counter() - self._triggered_at
+        self._triggered_at = None
+        self.ui.latency.record(self.kind, latency)
+        FIRST_FRAME.observe(latency, kind=self.kind)
+        logging.info(
+            f"{self.kind} reminder first frame after {latency * 1000:.1f} ms",
+            extra={"reminder": self.kind, "latency_ms": round(latency * 1000, 1)},
+        )
+
+
+class EyeRelaxWindow(OverlayWindow):
+    kind = "eye_relax"
+
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.blinking = True
+        self.remaining_time = 0
+        self.message_label = tk.Label(self.win, text="Look more than 20m away!", font=('Arial', 60))
+        self.message_label.place(relx=0.5, rely=0.45, anchor=tk.CENTER)
+        self.stop_blink_label = tk.Label(self.win, text="Hold mouse button to stop flashing", font=('Arial', 40))
+        self.stop_blink_label.place(relx=0.5, rely=0.55, anchor=tk.CENTER)
+        self.countdown_label = tk.Label(self.win, font=('Arial', 40))
+        self.countdown_label.place(relx=0.5, rely=0.65, anchor=tk.CENTER)
+        self.win.bind('<Button-1>', self.stop_blinking)
+        self.win.bind('<ButtonRelease-1>', self.start_blinking)
+
+    def show(self, triggered_at, flash_frequency, relax_duration):
+        self.flash_interval = round(1000 / flash_frequency) if flash_frequency > 0 else 10000
         relax_duration_s = round(relax_duration) if relax_duration > 0 else 20
-        relax_duration_ms = round(relax_duration_s * 1000)
-
-        blinking = True  # Variable to control the blinking
-
-        def update_text_colors(current_color):
-            foreground_color = "black" if current_color == "white" else "white"
-            for label in [message_label, stop_blink_label, countdown_label]:
-                label.configure(foreground=foreground_color, background=current_color)
-
-        def toggle_color(current_color):
-            if not blinking:
-                return
-            next_color = "white" if current_color == "black" else "black"
-            relax_win.configure(background=next_color)
-            update_text_colors(next_color)
-            relax_win.after(flash_interval, toggle_color, next_color)
-
-        def stop_blinking(event):
-            nonlocal blinking
-            blinking = False
-
-        def start_blinking(event):
-            nonlocal blinking
-            blinking = True
-            toggle_color(relax_win.cget('background'))
-
-        remaining_time = relax_duration_s  # Countdown logic
-
-        def update_countdown():
-            nonlocal remaining_time
-            remaining_time -= 1
-            countdown_label.configure(text=f"Remaining: {remaining_time}s")
-            if remaining_time > 0:
-                relax_win.after(1000, update_countdown)
-            else:
-                relax_win.destroy()
-
-        relax_win.bind('<Button-1>', stop_blinking)
-        relax_win.bind('<ButtonRelease-1>', start_blinking)
-
-        message_label = tk.Label(relax_win, text="Look more than 20m away!", font=('Arial', 60))
-        message_label.place(relx=0.5, rely=0.45, anchor=tk.CENTER)
-
-        stop_blink_label = tk.Label(relax_win, text="Hold mouse button to stop flashing", font=('Arial', 40))
-        stop_blink_label.place(relx=0.5, rely=0.55, anchor=tk.CENTER)
-
-        countdown_label = tk.Label(relax_win, text=f"Remaining: {remaining_time}s", font=('Arial', 40))
-        countdown_label.place(relx=0.5, rely=0.65, anchor=tk.CENTER)
-
-        toggle_color("white")
-        update_countdown()
-
-        relax_win.mainloop()
-    except Exception as e:
-        print(f"Debug: Error in eye_relax_reminder: {str(e)}")  # Debug print
-        logging.error(f"Error in eye_relax_reminder: {str(e)}")
-
-def show_custom_reminder(message, flashing, duration, cancel_key, flashing_freq=2, initial_color="black", fontsize=60):
-    print(f"Debug: show_custom_reminder called with message={message}, flashing={flashing}, duration={duration}, cancel_key={cancel_key}, flashing_freq={flashing_freq}, initial_color={initial_color}, fontsize={fontsize}")
-    logging.info(f"show_custom_reminder called with message={message}, flashing={flashing}, duration={duration}, cancel_key={cancel_key}, flashing_freq={flashing_freq}, initial_color={initial_color}, fontsize={fontsize}")
-    try:
-        win = tk.Tk()
-        win.attributes('-fullscreen', True)
-        win.attributes('-topmost', True)
-        win.focus_set()
-
-        bg_colors = ["white", "black"]
-        if initial_color not in bg_colors:
+        self.remaining_time = relax_duration_s
+        self.blinking = True
+        self.toggle_color("white")
+        self.present(triggered_at)
+        self.update_countdown()
+
+    def update_text_colors(self, current_color):
+        foreground_color = "black" if current_color == "white" else "white"
+        for label in [self.message_label, self.stop_blink_label, self.countdown_label]:
+            label.configure(foreground=foreground_color, background=current_color)
+
+    def toggle_color(self, current_color):
+        if not self.blinking:
+            return
+        next_color = "white" if current_color == "black" else "black"
+        self.win.configure(background=next_color)
+        self.update_text_colors(next_color)
+        self.after('flash', self.flash_interval, self.toggle_color, next_color)
+
+    def stop_blinking(self, event):
+        self.blinking = False
+        self.cancel('flash')
+
+    def start_blinking(self, event):
+        self.blinking = True
+        self.toggle_color(self.win.cget('background'))
+
+    def update_countdown(self):
+        self.remaining_time -= 1
+        self.countdown_label.configure(text=f"Remaining: {self.remaining_time}s")
+        if self.remaining_time > 0:
+            self.after('countdown', 1000, self.update_countdown)
+        else:
+            self.hide()
+
+
+class PostureWindow(OverlayWindow):
+    kind = "posture"
+
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.accept_keypress = False
+        self.range_seconds = DEFAULT_RANGE_SECONDS
+        self.win.configure(background="black")
+        self.plot_label = tk.Label(self.win, background="black")
+        self.message_label = tk.Label(self.win, text="How is your posture?", font=('Arial', 60), foreground="white", background="black")
+        self.message_label.place(relx=0.5, rely=0.1, anchor=tk.CENTER)
+        self.rating_label = tk.Label(self.win, text="Rate 1-5", font=('Arial', 40), foreground="white", background="black")
+        self.win.bind('<Key>', self.on_key)
+
+    def show(self, triggered_at, wait_duration, timeout, plot_img, range_seconds):
+        self.range_seconds = range_seconds
+        wait_duration_ms = round(wait_duration * 1000) if wait_duration > 0 else 3000
+        timeout_duration_ms = round(timeout * 1000) if timeout > 0 else 10000
+        self.accept_keypress = False
+        self.rating_label.place_forget()
+        if plot_img:
+            photo = ImageTk.PhotoImage(plot_img, master=self.win)
+            self.plot_label.configure(image=photo)
+            self.plot_label.image = photo  # Keep a reference to avoid garbage collection
+            self.plot_label.place(relx=0.5, rely=0.6, anchor=tk.CENTER)
+        else:
+            self.plot_label.place_forget()
+        self.present(triggered_at)
+        self.after('enable_keypress', wait_duration_ms, self.enable_keypress)
+        self.after('timeout', timeout_duration_ms, self.hide)
+
+    def enable_keypress(self):
+        self.accept_keypress = True
+        self.rating_label.place(relx=0.5, rely=0.2, anchor=tk.CENTER)
+
+    def on_key(self, event):
+        if not self.accept_keypress:
+            return
+        if event.char in ['1', '2', '3', '4', '5']:
+            try:
+                self.ui.ratings_store.append(int(event.char))
+                self.ui.chart_cache.refresh_async(self.ui.chart_size(), self.range_seconds)
+                logging.info(f"Posture rating {event.char} recorded")
+            except IOError as e:
+                logging.error(f"Error writing to ratings file: {str(e)}")
+            self.hide()
+
+    def hide(self, event=None):
+        self.accept_keypress = False
+        super().hide(event)
+        # Drop the chart so a multi-megapixel image is not held between reminders
+        self.plot_label.configure(image='')
+        self.plot_label.image = None
+
+
+class CustomWindow(OverlayWindow):
+    kind = "custom"
+
+    bg_colors = ["white", "black"]
+
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.cancel_binding = None
+        self.label = tk.Label(self.win)
+        self.label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+
+    def show(self, triggered_at, message, flashing, duration, cancel_key, flashing_freq=2, initial_color="black", fontsize=60):
+        if initial_color not in self.bg_colors:
             initial_color = "black"
-        current_color = bg_colors.index(initial_color)
-        flashing_active = [True]
-        interval_ms = int(1000 / max(1, flashing_freq))
-
-        def toggle_bg():
-            if not flashing or not flashing_active[0]:
-                return
-            nonlocal current_color
-            current_color = 1 - current_color
-            win.configure(background=bg_colors[current_color])
-            label.configure(foreground=bg_colors[1-current_color], background=bg_colors[current_color])
-            win.after(interval_ms, toggle_bg)
+        self.current_color = self.bg_colors.index(initial_color)
+        self.flashing = flashing
+        self.interval_ms = int(1000 / max(1, flashing_freq))
 
-        def close_reminder(event=None):
-            flashing_active[0] = False
-            win.destroy()
+        if self.cancel_binding:
+            self.win.unbind(self.cancel_binding)
+        self.cancel_binding = f'<{cancel_key}>'
+        self.win.bind(self.cancel_binding, self.hide)
 
-        win.bind(f'<{cancel_key}>', close_reminder)
-
-        label = tk.Label(win, text=message, font=('Arial', fontsize))
-        label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
-        win.configure(background=bg_colors[current_color])
-        label.configure(foreground=bg_colors[1-current_color], background=bg_colors[current_color])
+        self.label.configure(text=message, font=('Arial', fontsize))
+        self.apply_colors()
+        self.present(triggered_at)
 
         if flashing:
-            toggle_bg()
-
+            self.after('flash', self.interval_ms, self.toggle_bg)
         if duration > 0:
-            win.after(duration * 1000, close_reminder)
+            self.after('duration', duration * 1000, self.hide)
+
+    def apply_colors(self):
+        self.win.configure(background=self.bg_colors[self.current_color])
+        self.label.configure(foreground=self.bg_colors[1-self.current_color], background=self.bg_colors[self.current_color])
+
+    def toggle_bg(self):
+        self.current_color = 1 - self.current_color
+        self.apply_colors()
+        self.after('flash', self.interval_ms, self.toggle_bg)
+
+
+class ReminderUI:
+    """Single long-lived Tk thread that owns every reminder window.
+
+    Other threads hand it work through `submit`, which queues the request and
+    writes a byte to a pipe watched by the Tk event loop, so the UI thread
+    sleeps until there is something to show. One overlay is visible at a
+    time; the rest wait in a DispatchQueue, and a waiting reminder of higher
+    priority takes the screen from the one shown, which then waits again.
+
+    Each UI is bound to one X display and one user's ratings; a shared
+    daemon runs one per session. `on_start` runs first thing in the UI
+    thread, e.g. to switch it to the session user's file permissions.
+
+    Several UIs therefore mean several Tk interpreters in one process, each
+    in its own thread. Every interpreter is only used by the thread that
+    created it, which is what _tkinter requires with a threaded Tcl (an
+    unthreaded one serializes all Tcl calls behind a global lock instead),
+    and each root opens its own connection to its display, so no Xlib state
+    is shared between threads. A second UI for a display that already has
+    one fails to start until the first one's thread has ended.
+    """
+
+    window_classes = {
+        "eye_relax": EyeRelaxWindow,
+        "posture": PostureWindow,
+        "custom": CustomWindow,
+    }
+
+    def __init__(self, display=None, xauthority=None, ratings_store=None, chart_cache=None, on_start=None):
+        self.display = display
+        self.xauthority = xauthority
+        self.ratings_store = ratings_store
+        self.chart_cache = chart_cache
+        self.on_start = on_start
+        self._display_name = display or os.environ.get("DISPLAY")
+        self.latency = LatencyRecorder()
+        self.dispatch = DispatchQueue()
+        self._dispatch_lock = threading.Lock()
+        # The overlay on screen, its priority, coalescing key and queue item
+        self.visible = None
+        self._visible_priority = None
+        self._visible_key = None
+        self._visible_item = None
+        self._stopping = False
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ReminderUI", daemon=True)
+        self.windows = {}
+        self.screen_size = None
+        self.running = False
+
+    def start(self, timeout=10):
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self.running
+
+    def submit(self, kind, *args, triggered_at=None, priority=PRIORITY_HEALTH, key=None):
+        """Show a `kind` reminder once the screen is free.
+
+        Reminders with equal `key`s (by default the kind and arguments) are
+        coalesced while one of them waits or is shown. Returns what became
+        of the reminder: "queued", "coalesced" or "dropped", which includes
+        every reminder for a UI that is not running.
+        """
+        if not self.running:
+            logging.error(f"Reminder UI is not running, dropping {kind} reminder")
+            with self._dispatch_lock:
+                self.dispatch.count("dropped")
+            return "dropped"
+        if triggered_at is None:
+            triggered_at = time.perf_counter()
+        if key is None:
+            key = (kind,) + args
+        with self._dispatch_lock:
+            # Time spent waiting behind another overlay is not UI latency
+            waited = self._visible_key is not None or len(self.dispatch) > 0
+            outcome = self.dispatch.push(
+                priority, key, (kind, args, triggered_at, waited), visible_key=self._visible_key
+            )
+        if outcome == "queued":
+            os.write(self._wake_write, b"\0")
+        return outcome
+
+    def dispatch_stats(self):
+        with self._dispatch_lock:
+            stats = self.dispatch.stats()
+            stats["visible"] = self.visible.kind if self.visible is not None else None
+        return stats
+
+    def stop(self, timeout=5):
+        """Close every window and end the UI thread."""
+        if self._stopping:
+            return
+        self._stopping = True
+        if self._thread.is_alive():
+            # Also reaches a thread still connecting, once it listens for wake-ups
+            os.write(self._wake_write, b"\0")
+            self._thread.join(timeout)
+        self.running = False
+        if not self._thread.is_alive():
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+
+    def chart_size(self):
+        # The posture chart fills the area below the heading at the screen's own
+        # resolution, so it is never rendered larger than it can be shown
+        if self.screen_size is None:
+            return DEFAULT_SIZE
+        width, height = self.screen_size
+        return (int(width * 0.9), int(height * 0.68))
+
+    def _run(self):
+        name = self.display or "default display"
+        try:
+            if self.on_start is not None:
+                self.on_start()
+            self.root = self._connect()
+        except Exception as e:
+            logging.error(f"Error starting reminder UI on {name}: {str(e)}")
+            self._ready.set()
+            return
+        TK_ROOTS.inc()
+        try:
+            try:
+                self.root.withdraw()
+                self.screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+                for kind, window_class in self.window_classes.items():
+                    self.windows[kind] = window_class(self)
+                self.root.tk.createfilehandler(self._wake_read, tk.READABLE, self._on_wake)
+                self.running = True
+            finally:
+                self._ready.set()
+            self.root.mainloop()
+            if not self._stopping:
+                logging.error(f"Reminder UI on {name} stopped unexpectedly")
+        except Exception as e:
+            logging.error(f"Error {'in' if self.running else 'starting'} reminder UI on {name}: {str(e)}")
+        finally:
+            # Whoever asks for this UI next starts a new one; a root whose
+            # setup failed must not outlive it
+            self.running = False
+            self.root.tk.deletefilehandler(self._wake_read)
+            try:
+                self.root.destroy()
+            except tk.TclError:
+                pass  # Already destroyed by stop()
+            TK_ROOTS.inc(-1)
+            self._release_display()
+
+    def _connect(self):
+        with _display_lock:
+            if self._display_name in _display_owners:
+                raise RuntimeError(f"{self._display_name} already has a reminder UI")
+            previous = os.environ.get("XAUTHORITY")
+            if self.xauthority is not None:
+                os.environ["XAUTHORITY"] = self.xauthority
+            try:
+                root = tk.Tk(screenName=self.display)
+            finally:
+                if previous is None:
+                    os.environ.pop("XAUTHORITY", None)
+                else:
+                    os.environ["XAUTHORITY"] = previous
+            _display_owners[self._display_name] = self
+            return root
+
+    def _release_display(self):
+        with _display_lock:
+            if _display_owners.get(self._display_name) is self:
+                del _display_owners[self._display_name]
+
+    def _on_wake(self, fd, mask):
+        try:
+            os.read(fd, 4096)
+        except BlockingIOError:
+            pass
+        if self._stopping:
+            self.root.destroy()
+            return
+        self._show_next()
+
+    def _show_next(self):
+        while True:
+            with self._dispatch_lock:
+                priority = self.dispatch.peek_priority()
+                if priority is None:
+                    return
+                preempted = None
+                if self.visible is not None:
+                    if priority >= self._visible_priority:
+                        return
+                    preempted = self.visible
+                    self.dispatch.count("preempted")
+                    # It is shown again from the start once the screen is free
+                    kind, args, _, _ = self._visible_item
+                    self.dispatch.requeue(
+                        self._visible_priority, self._visible_key, (kind, args, None, True)
+                    )
+                else:
+                    priority, key, item = self.dispatch.pop()
+                    kind, args, triggered_at, waited = item
+                    self.visible = self.windows[kind]
+                    self._visible_priority, self._visible_key = priority, key
+                    self._visible_item = item
+            if preempted is not None:
+                # Hiding it frees the screen, and overlay_hidden comes back here
+                logging.info(f"{preempted.kind} reminder makes way for a more important one")
+                preempted.hide()
+                return
+            if waited:
+                triggered_at = time.perf_counter()
+            try:
+                self.visible.show(triggered_at, *args)
+                return
+            except Exception as e:
+                logging.error(f"Error in {kind} reminder: {str(e)}")
+                self.visible.win.withdraw()
+                self._clear_visible()
+
+    def overlay_hidden(self, window):
+        if window is not self.visible:
+            return
+        self._clear_visible()
+        # Once the hiding window is done tidying up, which may be the one shown next
+        self.root.after_idle(self._show_next)
+
+    def _clear_visible(self):
+        with self._dispatch_lock:
+            self.visible = None
+            self._visible_priority = self._visible_key = self._visible_item = None
+
+
+_ui = None
+_ui_lock = threading.Lock()
+_ui_backoff = Backoff()
+
+
+def get_ui():
+    """The UI of a single-user daemon: the default display and the user's own store.
+
+    A UI that failed to start, or whose thread ended, is replaced by a new
+    one on a later call; after failures, no sooner than `_ui_backoff` allows.
+    """
+    global _ui
+    with _ui_lock:
+        if _ui is not None and (_ui.running or not _ui_backoff.ready()):
+            return _ui
+        if _ui is None:
+            # The text file is only read once, to seed the binary store
+            ratings_store = RatingsStore(legacy_path=ratings_file_path)
+            chart_cache = ChartCache(ratings_store)
+        else:
+            ratings_store, chart_cache = _ui.ratings_store, _ui.chart_cache
+            _ui.stop()
+        _ui = ReminderUI(ratings_store=ratings_store, chart_cache=chart_cache)
+        if _ui.start():
+            _ui_backoff.succeeded()
+        else:
+            delay = _ui_backoff.failed()
+            logging.error(f"Reminder UI failed to start, trying again in {delay:.0f} s at the earliest")
+        return _ui
+
+
+def chart_size():
+    return get_ui().chart_size()
+
+
+def ui_latency_stats():
+    return _ui.latency.stats() if _ui is not None else {}
+
+
+def eye_relax_reminder(flash_frequency, relax_duration, ui=None):
+    logging.info(f"eye_relax_reminder called with flash_frequency={flash_frequency}, relax_duration={relax_duration}")
+    (ui or get_ui()).submit("eye_relax", flash_frequency, relax_duration)
 
-        win.mainloop()
-    except Exception as e:
-        print(f"Debug: Error in show_custom_reminder: {str(e)}")
-        logging.error(f"Error in show_custom_reminder: {str(e)}")
+def show_custom_reminder(message, flashing, duration, cancel_key, flashing_freq=2, initial_color="black", fontsize=60, ui=None, priority=PRIORITY_ADHOC, key=None):
+    logging.info(f"show_custom_reminder called with message={message}, flashing={flashing}, duration={duration}, cancel_key={cancel_key}, flashing_freq={flashing_freq}, initial_color={initial_color}, fontsize={fontsize}")
+    return (ui or get_ui()).submit("custom", message, flashing, duration, cancel_key, flashing_freq, initial_color, fontsize, priority=priority, key=key)
 
-def posture_reminder(wait_duration, timeout=10):
-    print(f"Debug: posture_reminder called with wait_duration={wait_duration}, timeout={timeout}")  # Debug print
+def posture_reminder(wait_duration, timeout=10, history_days=1, ui=None):
     logging.info(f"posture_reminder called with wait_duration={wait_duration}, timeout={timeout}")
+    # The chart is normally pre-rendered; if the cache is stale it is rendered
+    # here, in the caller's thread, so the Tk thread stays responsive. The
+    # latency measurement includes it either way.
+    triggered_at = time.perf_counter()
+    ui = ui or get_ui()
+    range_seconds = round(history_days * 24 * 3600) if history_days > 0 else DEFAULT_RANGE_SECONDS
     try:
-        wait_duration_ms = round(wait_duration * 1000) if wait_duration > 0 else 3000
-        timeout_duration_ms = round(timeout * 1000) if timeout > 0 else 10000
-        accept_keypress = False
-        posture_win = tk.Tk()
-        posture_win.attributes('-fullscreen', True)
-        posture_win.attributes('-topmost', True)
-        posture_win.configure(background="black")
-        plot_img = generate_plot(ratings_file_path)
-        if plot_img:
-            photo = ImageTk.PhotoImage(plot_img)
-            label = tk.Label(posture_win, image=photo, background="black")
-            label.image = photo  # Keep a reference to avoid garbage collection
-            label.place(relx=0.5, rely=0.6, anchor=tk.CENTER)
-
-        message_label = tk.Label(posture_win, text="How is your posture?", font=('Arial', 60), foreground="white", background="black")
-        message_label.place(relx=0.5, rely=0.1, anchor=tk.CENTER)
-
-        def enable_keypress():
-            nonlocal accept_keypress
-            accept_keypress = True
-            rating_label = tk.Label(posture_win, text="Rate 1-5", font=('Arial', 40), foreground="white", background="black")
-            rating_label.place(relx=0.5, rely=0.2, anchor=tk.CENTER)
-
-        def on_key(event):
-            if not accept_keypress:
-                return
-            if event.char in ['1', '2', '3', '4', '5']:
-                try:
-                    with open(ratings_file_path, "a") as file:
-                        file.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Rating: {event.char}\n")
-                    print(f"Debug: Posture rating {event.char} recorded")  # Debug print
-                    logging.info(f"Posture rating {event.char} recorded")
-                except IOError as e:
-                    print(f"Debug: Error writing to ratings file: {str(e)}")  # Debug print
-                    logging.error(f"Error writing to ratings file: {str(e)}")
-                posture_win.destroy()
-
-        def close_window():
-            posture_win.destroy()
-
-        posture_win.bind('<Key>', on_key)
-        posture_win.after(wait_duration_ms, enable_keypress)
-        posture_win.after(timeout_duration_ms, close_window)
-
-        posture_win.mainloop()
+        plot_img = ui.chart_cache.get(ui.chart_size(), range_seconds)
     except Exception as e:
-        print(f"Debug: Error in posture_reminder: {str(e)}")  # Debug print
         logging.error(f"Error in posture_reminder: {str(e)}")
+        plot_img = None
+    # Charts differ from one render to the next; any two posture reminders are the same
+    ui.submit("posture", wait_duration, timeout, plot_img, range_seconds, triggered_at=triggered_at, key=("posture",))
 
 if __name__ == "__main__":
     # For testing purposes
-    print("Debug: Testing eye_relax_reminder")
+    from log_pipeline import setup_logging
+
+    setup_logging("notifications", console=True)
+    print("Testing eye_relax_reminder")
     eye_relax_reminder(1, 20)
-    print("Debug: Testing posture_reminder")
-    posture_reminder(3, 10)
\ No newline at end of file
+    time.sleep(21)
+    print("Testing posture_reminder")
+    posture_reminder(3, 10)
+    time.sleep(11)
+    print(f"First frame latency: {ui_latency_stats()}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import time
+
+
+class TokenBucket:
+    """Allows `rate` events a second on average, and bursts of up to `burst`.
+
+    Not thread-safe; callers sharing a bucket between threads lock around it.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def take(self, tokens=1):
+        """Use up `tokens` if that many are available; returns whether they were."""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+
+class Backoff:
+    """Spaces out the retries of something that keeps failing.
+
+    After each failure the wait before the next attempt doubles, from
+    `initial` up to `maximum` seconds; a success resets it. Not thread-safe.
+    """
+
+    def __init__(self, initial=5.0, maximum=300.0, clock=time.monotonic):
+        self.initial = initial
+        self.maximum = maximum
+        self.failures = 0
+        self._clock = clock
+        self._retry_at = 0.0
+
+    def ready(self):
+        """Whether the next attempt may be made now."""
+        return self._clock() >= self._retry_at
+
+    def failed(self):
+        """Record a failure; returns the seconds until the next attempt."""
+        delay = min(self.maximum, self.initial * 2 ** self.failures)
+        self.failures += 1
+        self._retry_at = self._clock() + delay
+        return delay
+
+    def succeeded(self):
+        self.failures = 0
+        self._retry_at = 0.0
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+
+from ratings_store import DAY, HOUR, local_epochs
+
+GOOD_RATING = 4
+
+
+def rolling_mean(times, ratings, window_seconds=DAY, max_points=500):
+    """Mean of the ratings in the trailing `window_seconds` at each rating.
+
+    Computed from a cumulative sum, so every window costs two lookups no
+    matter how many ratings it spans. At most `max_points` evenly spaced
+    points are returned.
+    """
+    if len(times) == 0:
+        return []
+    totals = np.concatenate(([0], np.cumsum(ratings, dtype="<i8")))
+    hi = np.arange(1, len(times) + 1)
+    lo = np.searchsorted(times, times - window_seconds, side="right")
+    means = (totals[hi] - totals[lo]) / (hi - lo)
+    keep = np.unique(np.linspace(0, len(times) - 1, min(len(times), max_points)).astype(int))
+    return [
+        {"time": int(t), "mean": round(float(m), 3)}
+        for t, m in zip(times[keep], means[keep])
+    ]
+
+
+def hour_of_day_profile(times, ratings):
+    """Number of ratings and mean rating for each local hour of the day."""
+    hours = (local_epochs(times) % DAY) // HOUR
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=ratings, minlength=24)
+    return [
+        {
+            "hour": hour,
+            "count": int(counts[hour]),
+            "mean": round(float(sums[hour] / counts[hour]), 3) if counts[hour] else None,
+        }
+        for hour in range(24)
+    ]
+
+
+def run_lengths(flags):
+    """Lengths of the runs of True in a boolean array, in order."""
+    edges = np.diff(np.concatenate(([0], flags.astype("i1"), [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def streaks(times, ratings, good_rating=GOOD_RATING, now=None):
+    """Current and longest runs of good ratings and of consecutive rated days.
+
+    The day streak only counts as current while its last day is today or
+    yesterday.
+    """
+    good = run_lengths(ratings >= good_rating)
+    days = np.unique(local_epochs(times) // DAY)
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    day_runs = np.diff(np.concatenate(([0], breaks, [len(days)])))
+    today = local_epochs(np.array([int(time.time() if now is None else now)]))[0] // DAY
+    return {
+        "good_rating": good_rating,
+        "current_good": int(good[-1]) if len(ratings) and ratings[-1] >= good_rating else 0,
+        "longest_good": int(good.max()) if len(good) else 0,
+        "current_days": int(day_runs[-1]) if len(days) and days[-1] >= today - 1 else 0,
+        "longest_days": int(day_runs.max()) if len(days) else 0,
+    }
+
+
+def summarize(times, ratings, window_seconds=DAY, good_rating=GOOD_RATING):
+    summary = {"count": int(len(ratings))}
+    if len(ratings):
+        summary.update(
+            first=int(times[0]),
+            last=int(times[-1]),
+            mean=round(float(ratings.mean()), 3),
+            min=int(ratings.min()),
+            max=int(ratings.max()),
+        )
+    summary["rolling_mean"] = rolling_mean(times, ratings, window_seconds)
+    summary["hour_of_day"] = hour_of_day_profile(times, ratings)
+    summary["streaks"] = streaks(times, ratings, good_rating)
+    return summary
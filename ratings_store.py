@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+DATA_DIR = os.path.expanduser("~/.local/share/Remind2Rest")
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, "posture_ratings.bin")
+
+# One fixed-width record per rating: epoch seconds and the rating itself
+RECORD = struct.Struct("<qB")
+RECORD_DTYPE = np.dtype([("time", "<i8"), ("rating", "u1")])
+
+# Rollup tiers: per bucket, the number of ratings, their sum, min and max
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+ROLLUP_TIERS = {"hourly": HOUR, "daily": DAY, "weekly": WEEK}
+ROLLUP_RECORD = struct.Struct("<qIIBB")
+ROLLUP_DTYPE = np.dtype(
+    [("start", "<i8"), ("count", "<u4"), ("sum", "<u4"), ("min", "u1"), ("max", "u1")]
+)
+
+
+def bucket_start(epoch, seconds):
+    """Start of the rollup bucket holding `epoch`.
+
+    Days start at local midnight and weeks on Monday, matching what the
+    chart axis shows.
+    """
+    local = epoch + time.localtime(epoch).tm_gmtoff
+    # 1970-01-01 was a Thursday; shift so that weeks start on Monday
+    shift = 3 * DAY if seconds == WEEK else 0
+    return epoch - (local + shift) % seconds
+
+
+def local_epochs(times):
+    """Shift an array of epochs by the local UTC offset in effect at each one."""
+    # UTC offsets only change between days, so look them up once per day
+    days, day_index = np.unique(times // DAY, return_inverse=True)
+    offsets = np.array(
+        [time.localtime(int(day) * DAY + DAY // 2).tm_gmtoff for day in days],
+        dtype="<i8",
+    )
+    return times + offsets[day_index].reshape(times.shape)
+
+
+def parse_legacy_line(line):
+    time_str, rating_str = line.strip().split(" - Rating: ")
+    timestamp = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
+    return int(timestamp.timestamp()), int(rating_str)
+
+
+class RatingsStore:
+    """Append-only binary file of posture ratings, kept sorted by time.
+
+    Records are fixed width, so the file can be memory-mapped as a NumPy
+    record array and a time window located with a binary search instead of
+    parsing the whole history.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, legacy_path=None):
+        self.path = path
+        if legacy_path is not None:
+            self.import_legacy(legacy_path)
+        if len(self) and not all(
+            os.path.exists(self.rollup_path(tier)) for tier in ROLLUP_TIERS
+        ):
+            self.rebuild_rollups()
+
+    def rollup_path(self, tier):
+        return f"{os.path.splitext(self.path)[0]}.{tier}.bin"
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // RECORD.size
+        except FileNotFoundError:
+            return 0
+
+    def version(self):
+        """Marker that changes on every write, or None while the store is empty."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    def last_record(self):
+        count = len(self)
+        if count == 0:
+            return None
+        with open(self.path, "rb") as file:
+            file.seek((count - 1) * RECORD.size)
+            return RECORD.unpack(file.read(RECORD.size))
+
+    def append(self, rating, timestamp=None):
+        epoch = int(time.time() if timestamp is None else timestamp)
+        last = self.last_record()
+        if last is not None and epoch < last[0]:
+            # Wall clock stepped back; clamp so the file stays sorted
+            epoch = last[0]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as file:
+            file.write(RECORD.pack(epoch, rating))
+        for tier, seconds in ROLLUP_TIERS.items():
+            self._add_to_rollup(self.rollup_path(tier), bucket_start(epoch, seconds), rating)
+
+    def _add_to_rollup(self, path, start, rating):
+        # Update the last bucket in place, or start a new one
+        open(path, "ab").close()
+        with open(path, "r+b") as file:
+            file.seek(0, os.SEEK_END)
+            end = file.tell() - file.tell() % ROLLUP_RECORD.size
+            if end:
+                file.seek(end - ROLLUP_RECORD.size)
+                last_start, count, total, low, high = ROLLUP_RECORD.unpack(
+                    file.read(ROLLUP_RECORD.size)
+                )
+                if last_start == start:
+                    file.seek(end - ROLLUP_RECORD.size)
+                    file.write(
+                        ROLLUP_RECORD.pack(
+                            start, count + 1, total + rating, min(low, rating), max(high, rating)
+                        )
+                    )
+                    return
+            file.seek(end)
+            file.write(ROLLUP_RECORD.pack(start, 1, rating, rating, rating))
+
+    def locate(self, start=None, end=None):
+        """Record indices (lo, hi) of the window start <= time < end."""
+        count = len(self)
+        if count == 0:
+            return 0, 0
+        records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+        try:
+            times = records["time"]
+            lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            hi = count if end is None else int(np.searchsorted(times, end, side="left"))
+        finally:
+            del records
+        return lo, hi
+
+    def read_slice(self, lo, hi):
+        """Return (times, ratings) arrays for records lo..hi-1."""
+        hi = min(hi, len(self))
+        if hi <= lo:
+            return np.empty(0, dtype="<i8"), np.empty(0, dtype="u1")
+        window = np.fromfile(
+            self.path, dtype=RECORD_DTYPE, count=hi - lo, offset=lo * RECORD.size
+        )
+        return window["time"], window["rating"]
+
+    def read_range(self, start=None, end=None):
+        """Return (times, ratings) arrays for records with start <= time < end."""
+        return self.read_slice(*self.locate(start, end))
+
+    def read_rollup(self, tier, start=None, end=None):
+        """Return the buckets of `tier` that start in [start, end) as a record array."""
+        path = self.rollup_path(tier)
+        try:
+            count = os.path.getsize(path) // ROLLUP_RECORD.size
+        except FileNotFoundError:
+            count = 0
+        if count == 0:
+            return np.empty(0, dtype=ROLLUP_DTYPE)
+        buckets = np.memmap(path, dtype=ROLLUP_DTYPE, mode="r", shape=(count,))
+        try:
+            starts = buckets["start"]
+            lo = 0 if start is None else int(np.searchsorted(starts, start, side="left"))
+            hi = count if end is None else int(np.searchsorted(starts, end, side="left"))
+            return np.array(buckets[lo:hi])
+        finally:
+            del buckets
+
+    def rebuild_rollups(self):
+        """Recompute every rollup tier from the raw records."""
+        times, ratings = self.read_range()
+        local = local_epochs(times)
+        for tier, seconds in ROLLUP_TIERS.items():
+            shift = 3 * DAY if seconds == WEEK else 0
+            starts = times - (local + shift) % seconds
+            bucket_starts, bucket_index = np.unique(starts, return_inverse=True)
+            bucket_index = bucket_index.reshape(starts.shape)
+            buckets = np.zeros(len(bucket_starts), dtype=ROLLUP_DTYPE)
+            buckets["start"] = bucket_starts
+            buckets["count"] = np.bincount(bucket_index, minlength=len(bucket_starts))
+            buckets["sum"] = np.bincount(
+                bucket_index, weights=ratings, minlength=len(bucket_starts)
+            )
+            lows = np.full(len(bucket_starts), 255, dtype="u1")
+            np.minimum.at(lows, bucket_index, ratings)
+            highs = np.zeros(len(bucket_starts), dtype="u1")
+            np.maximum.at(highs, bucket_index, ratings)
+            buckets["min"] = lows
+            buckets["max"] = highs
+            path = self.rollup_path(tier)
+            tmp_path = f"{path}.tmp"
+            buckets.tofile(tmp_path)
+            os.replace(tmp_path, path)
+
+    def import_legacy(self, legacy_path):
+        """Convert the old text ratings file, once, into the binary store."""
+        if os.path.exists(self.path) or not os.path.exists(legacy_path):
+            return 0
+        records = []
+        with open(legacy_path, "r") as file:
+            for line in file:
+                try:
+                    records.append(parse_legacy_line(line))
+                except ValueError as e:
+                    logging.error(
+                        f"Error parsing line in ratings file: {line}. Error: {str(e)}"
+                    )
+        records.sort(key=lambda record: record[0])
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(b"".join(RECORD.pack(*record) for record in records))
+        os.replace(tmp_path, self.path)
+        logging.info(f"Imported {len(records)} ratings from {legacy_path}")
+        return len(records)
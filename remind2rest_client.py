@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import socket
+import threading
+import time
+
+from ipc_protocol import (
+    SUBSCRIBE,
+    decode_frame,
+    default_socket_path,
+    encode_frame,
+    split_frames,
+)
+
+
+class Remind2RestError(Exception):
+    pass
+
+
+class Remind2RestClient:
+    """Persistent, thread-safe connection to the Remind2Rest daemon.
+
+    The connection is opened on first use and kept for later requests. When
+    the daemon is unreachable, reconnect attempts back off exponentially up
+    to `max_backoff` seconds instead of hammering the socket.
+    """
+
+    def __init__(self, socket_path=None, timeout=5.0, max_backoff=30.0):
+        self.socket_path = socket_path if socket_path is not None else default_socket_path()
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._sock = None
+        self._buffer = b""
+        self._next_id = 1
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def request(self, action, **params):
+        """Send one request and return its result."""
+        return self.batch([dict(params, action=action)])[0]
+
+    def batch(self, requests):
+        """Pipeline several requests over the connection and return their results.
+
+        All requests are written before any reply is read, so the whole batch
+        costs a single round trip.
+        """
+        with self._lock:
+            frames = []
+            for request in requests:
+                frames.append(dict(request, id=self._next_id))
+                self._next_id += 1
+            payload = b"".join(encode_frame(frame) for frame in frames)
+            self._send(payload)
+            responses = {}
+            try:
+                while len(responses) < len(frames):
+                    response = self._read_frame()
+                    responses[response.get("id")] = response
+            except OSError:
+                self._disconnect()
+                raise
+
+        results = []
+        for frame in frames:
+            response = responses.get(frame["id"])
+            if response is None or not response.get("ok"):
+                error = response.get("error") if response else "No response"
+                raise Remind2RestError(f"{frame['action']} failed: {error}")
+            results.append(response.get("result"))
+        return results
+
+    def subscribe(self):
+        """Yield the daemon's state changes as {"event": ..., "data": ...} dicts.
+
+        Uses a connection of its own, so requests can go on in parallel. The
+        first item is a "status" event with the full current status. Raises
+        ConnectionError once the daemon goes away.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall(encode_frame({"id": 0, "action": SUBSCRIBE}))
+            # Events may be hours apart
+            sock.settimeout(None)
+            buffer = b""
+            while True:
+                frames, buffer = split_frames(buffer)
+                for line in frames:
+                    message = decode_frame(line)
+                    if "event" in message:
+                        yield message
+                    elif message.get("ok"):
+                        yield {"event": "status", "data": message.get("result")}
+                    else:
+                        raise Remind2RestError(f"SUBSCRIBE failed: {message.get('error')}")
+                data = sock.recv(65536)
+                if not data:
+                    raise ConnectionError("Remind2Rest closed the connection")
+                buffer += data
+        finally:
+            sock.close()
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _send(self, payload):
+        # A connection that went stale (daemon restarted) fails on write,
+        # before the daemon saw anything, so retrying once is safe
+        for attempt in range(2):
+            sock = self._connect()
+            try:
+                sock.sendall(payload)
+                return
+            except OSError:
+                self._disconnect()
+                if attempt:
+                    raise
+
+    def _connect(self):
+        if self._sock is not None:
+            return self._sock
+        if time.monotonic() < self._retry_at:
+            raise ConnectionError("Remind2Rest unreachable, waiting before reconnecting")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            self._failures += 1
+            backoff = min(self.max_backoff, 0.1 * 2 ** (self._failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            raise
+        self._failures = 0
+        self._retry_at = 0.0
+        self._sock = sock
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._buffer = b""
+
+    def _read_frame(self):
+        while b"\n" not in self._buffer:
+            data = self._sock.recv(65536)
+            if not data:
+                raise ConnectionError("Remind2Rest closed the connection")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return decode_frame(line)
+
+
+_default_client = Remind2RestClient()
+
+
+def get_client():
+    return _default_client
+
+
+def send_command(action, **params):
+    return _default_client.request(action, **params)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Scheduled custom reminders, kept in an SQLite database.
+
+A job shows a custom message either once ("at"), every N minutes
+("every") or on a crontab schedule ("cron"). Each row carries the time it
+fires next, and that column is indexed, so the earliest job and all due
+jobs are found with index range queries however many jobs exist.
+
+When a job is found late (after a restart, a suspend or a busy moment) its
+misfire policy decides what happens:
+
+    fire_once  show it once, however many runs were missed (default)
+    skip       drop the missed runs if it is more than `misfire_grace`
+               seconds late
+    fire_all   show every missed run, up to MAX_CATCH_UP
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from user_identity import fs_identity
+
+KINDS = ("at", "every", "cron")
+MISFIRE_POLICIES = ("fire_once", "skip", "fire_all")
+DEFAULT_MISFIRE_GRACE = 60
+MAX_CATCH_UP = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    params TEXT NOT NULL,
+    misfire TEXT NOT NULL,
+    misfire_grace REAL NOT NULL,
+    next_fire REAL NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reminders_next_fire ON reminders (next_fire);
+"""
+COLUMNS = "id, kind, spec, params, misfire, misfire_grace, next_fire"
+
+
+def custom_reminder_params(request):
+    """The display settings of a custom reminder request, with their defaults."""
+    return {
+        "message": str(request.get("message", "Reminder!")),
+        "flashing": bool(request.get("flashing", False)),
+        "duration": int(request.get("duration", 0)),
+        "cancel_key": str(request.get("cancel_key", "Escape")),
+        "flashing_freq": int(request.get("flashing_freq", 2)),
+        "initial_color": str(request.get("initial_color", "black")),
+        "fontsize": int(request.get("fontsize", 60)),
+    }
+
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 string (local time if naive)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    raise ValueError(f"Invalid time: {value!r}")
+
+
+def cron_trigger(expression):
+    from apscheduler.triggers.cron import CronTrigger
+
+    return CronTrigger.from_crontab(expression)
+
+
+def next_fire(kind, spec, after):
+    """The first fire time strictly after `after`, or None once the job is done."""
+    if kind == "at":
+        return spec["at"] if spec["at"] > after else None
+    if kind == "every":
+        period = spec["minutes"] * 60
+        if after < spec["start"]:
+            return spec["start"]
+        return spec["start"] + (math.floor((after - spec["start"]) / period) + 1) * period
+    trigger = cron_trigger(spec["cron"])
+    # Crontab times are whole minutes, so a second later is strictly after
+    moment = datetime.fromtimestamp(math.floor(after) + 1, trigger.timezone)
+    fire_time = trigger.get_next_fire_time(None, moment)
+    return fire_time.timestamp() if fire_time is not None else None
+
+
+def parse_job(request, now):
+    """(kind, spec, misfire, misfire_grace) of a schedule_reminder request."""
+    kinds = [kind for kind in KINDS if request.get(kind) is not None]
+    if len(kinds) != 1:
+        raise ValueError("Give exactly one of 'at', 'every' or 'cron'")
+    kind = kinds[0]
+    if kind == "at":
+        spec = {"at": parse_time(request["at"])}
+        if spec["at"] <= now:
+            raise ValueError("'at' is in the past")
+    elif kind == "every":
+        minutes = request["every"]
+        if not isinstance(minutes, (int, float)) or isinstance(minutes, bool) or minutes <= 0:
+            raise ValueError(f"Invalid 'every': {minutes!r}")
+        start = request.get("start")
+        spec = {"minutes": minutes, "start": parse_time(start) if start is not None else now}
+    else:
+        spec = {"cron": str(request["cron"])}
+        cron_trigger(spec["cron"])
+    misfire = request.get("misfire", "fire_once")
+    if misfire not in MISFIRE_POLICIES:
+        raise ValueError(f"Invalid 'misfire', expected one of {', '.join(MISFIRE_POLICIES)}")
+    misfire_grace = float(request.get("misfire_grace", DEFAULT_MISFIRE_GRACE))
+    return kind, spec, misfire, misfire_grace
+
+
+def due_runs(job, now):
+    """The scheduled times of the runs a due job shows at `now`, and when it fires next (None when done)."""
+    late = now - job["next_fire"]
+    if job["misfire"] == "skip" and late > job["misfire_grace"]:
+        runs = []
+    elif job["misfire"] == "fire_all":
+        runs = [job["next_fire"]]
+        fire_time = next_fire(job["kind"], job["spec"], job["next_fire"])
+        while fire_time is not None and fire_time <= now and len(runs) < MAX_CATCH_UP:
+            runs.append(fire_time)
+            fire_time = next_fire(job["kind"], job["spec"], fire_time)
+    else:
+        runs = [job["next_fire"]]
+    return runs, next_fire(job["kind"], job["spec"], now)
+
+
+class ReminderStore:
+    """The scheduled custom reminders of one user.
+
+    The database is opened on first use. With an `identity` (uid, gid) it is
+    read and written with that user's permissions. Safe to use from any thread.
+    """
+
+    def __init__(self, path, identity=None):
+        self.path = path
+        self.identity = identity
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, args=()):
+        """Run one statement in its own transaction; returns (rows, cursor)."""
+        with self._lock, fs_identity(self.identity):
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.executescript(SCHEMA)
+            with self._conn:
+                cursor = self._conn.execute(sql, args)
+                return cursor.fetchall(), cursor
+
+    def add(self, kind, spec, params, misfire, misfire_grace, next_fire):
+        _, cursor = self._execute(
+            "INSERT INTO reminders (kind, spec, params, misfire, misfire_grace, next_fire, created)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, json.dumps(spec), json.dumps(params), misfire, misfire_grace, next_fire, time.time()),
+        )
+        rows, _ = self._execute(f"SELECT {COLUMNS} FROM reminders WHERE id = ?", (cursor.lastrowid,))
+        return self._job(rows[0])
+
+    def cancel(self, job_id):
+        _, cursor = self._execute("DELETE FROM reminders WHERE id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    def jobs(self):
+        rows, _ = self._execute(f"SELECT {COLUMNS} FROM reminders ORDER BY next_fire")
+        return [self._job(row) for row in rows]
+
+    def due(self, now):
+        rows, _ = self._execute(
+            f"SELECT {COLUMNS} FROM reminders WHERE next_fire <= ? ORDER BY next_fire", (now,)
+        )
+        return [self._job(row) for row in rows]
+
+    def next_fire(self):
+        rows, _ = self._execute("SELECT MIN(next_fire) FROM reminders")
+        return rows[0][0]
+
+    def reschedule(self, job_id, next_fire):
+        if next_fire is None:
+            self._execute("DELETE FROM reminders WHERE id = ?", (job_id,))
+        else:
+            self._execute("UPDATE reminders SET next_fire = ? WHERE id = ?", (next_fire, job_id))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _job(self, row):
+        job_id, kind, spec, params, misfire, misfire_grace, fire_time = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "spec": json.loads(spec),
+            "params": json.loads(params),
+            "misfire": misfire,
+            "misfire_grace": misfire_grace,
+            "next_fire": fire_time,
+        }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Registry of the kinds of reminders the daemon can schedule.
+
+A reminder module owns one section of the config, named after the module:
+
+    "hydration": {"enabled": true, "reminders": [15, 45], "message": "Drink!"}
+
+Its `schema` lists every setting with its type and default (REQUIRED for
+settings the config must contain), and `trigger` shows the reminder. New
+kinds of reminders are added by registering another module; the daemon
+itself never names one.
+"""
+
+REQUIRED = object()
+NUMBER = (int, float)
+
+# What happens to a reminder found late, e.g. after a suspend: "fire_once"
+# shows it once however late it is, "skip" drops it when it is more than
+# "misfire_grace" seconds late. Set for all modules at the config's top level.
+MISFIRE_POLICIES = ("fire_once", "skip")
+DEFAULT_MISFIRE_POLICY = "fire_once"
+DEFAULT_MISFIRE_GRACE = 300
+
+
+class ReminderModule:
+    """Base class of reminder modules.
+
+    Modules marked `required` must have a section in every config; the
+    others count as disabled without one.
+    """
+
+    name = None
+    required = False
+    schema = {
+        "enabled": (bool, REQUIRED),
+        "reminders": (list, REQUIRED),
+    }
+
+    def validate(self, settings):
+        if not isinstance(settings, dict):
+            raise ValueError(f"'{self.name}' must be an object")
+        for key, (kind, default) in self.schema.items():
+            if key not in settings:
+                if default is REQUIRED:
+                    raise ValueError(f"Missing '{key}' for module {self.name}")
+                continue
+            value = settings[key]
+            # JSON has no separate bool for numbers to be confused with, Python does
+            if not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+                raise ValueError(f"Invalid '{key}' for module {self.name}: {value!r}")
+        for reminder in settings["reminders"]:
+            if not isinstance(reminder, int) or isinstance(reminder, bool):
+                raise ValueError(f"Invalid reminder minute for module {self.name}: {reminder!r}")
+
+    def settings(self, settings):
+        """`settings` with every missing optional setting at its default."""
+        defaults = {
+            key: default for key, (_, default) in self.schema.items() if default is not REQUIRED
+        }
+        return dict(defaults, **settings)
+
+    def trigger(self, settings, ui):
+        raise NotImplementedError
+
+
+class EyeRelaxModule(ReminderModule):
+    name = "eye_relax"
+    required = True
+    schema = dict(
+        ReminderModule.schema,
+        relax_duration=(NUMBER, 20),
+        flash_frequency=(NUMBER, 1),
+    )
+
+    def trigger(self, settings, ui):
+        from notifications import eye_relax_reminder
+
+        eye_relax_reminder(settings["flash_frequency"], settings["relax_duration"], ui=ui)
+
+
+class PostureModule(ReminderModule):
+    name = "posture"
+    required = True
+    schema = dict(
+        ReminderModule.schema,
+        wait_duration=(NUMBER, 3),
+        history_days=(NUMBER, 1),
+    )
+
+    def trigger(self, settings, ui):
+        from notifications import posture_reminder
+
+        posture_reminder(settings["wait_duration"], history_days=settings["history_days"], ui=ui)
+
+
+class MessageModule(ReminderModule):
+    """A fullscreen message, e.g. to drink water or stretch."""
+
+    def __init__(self, name, message):
+        self.name = name
+        self.schema = dict(
+            ReminderModule.schema,
+            message=(str, message),
+            flashing=(bool, False),
+            duration=(int, 10),
+            cancel_key=(str, "Escape"),
+            fontsize=(int, 60),
+        )
+
+    def trigger(self, settings, ui):
+        from dispatch_queue import PRIORITY_HEALTH
+        from notifications import show_custom_reminder
+
+        show_custom_reminder(
+            settings["message"],
+            settings["flashing"],
+            settings["duration"],
+            settings["cancel_key"],
+            fontsize=settings["fontsize"],
+            ui=ui,
+            priority=PRIORITY_HEALTH,
+        )
+
+
+registry = {}
+
+
+def register(module):
+    if module.name in registry:
+        raise ValueError(f"Reminder module {module.name} is already registered")
+    registry[module.name] = module
+    return module
+
+
+def configured_modules(config):
+    """Names of the registered modules that have a section in `config`."""
+    return [name for name in registry if name in config]
+
+
+def validate_config(config):
+    if "global_interval" not in config:
+        raise ValueError("Missing 'global_interval' in config")
+    interval = config["global_interval"]
+    if not isinstance(interval, int) or isinstance(interval, bool) or interval <= 0:
+        raise ValueError(f"Invalid 'global_interval' in config: {interval!r}")
+    if config.get("misfire_policy", DEFAULT_MISFIRE_POLICY) not in MISFIRE_POLICIES:
+        raise ValueError(
+            f"Invalid 'misfire_policy' in config, expected one of {', '.join(MISFIRE_POLICIES)}"
+        )
+    grace = config.get("misfire_grace", DEFAULT_MISFIRE_GRACE)
+    if not isinstance(grace, NUMBER) or isinstance(grace, bool) or grace < 0:
+        raise ValueError(f"Invalid 'misfire_grace' in config: {grace!r}")
+    for name, module in registry.items():
+        if name in config:
+            module.validate(config[name])
+        elif module.required:
+            raise ValueError(f"Missing '{name}' in config")
+
+
+def misfire_policy(config):
+    """The config's (policy, grace seconds) for late reminders."""
+    return (
+        config.get("misfire_policy", DEFAULT_MISFIRE_POLICY),
+        config.get("misfire_grace", DEFAULT_MISFIRE_GRACE),
+    )
+
+
+def trigger(name, settings, ui):
+    module = registry[name]
+    module.trigger(module.settings(settings), ui)
+
+
+register(EyeRelaxModule())
+register(PostureModule())
+register(MessageModule("hydration", "Time for a glass of water!"))
+register(MessageModule("stretch", "Stand up and stretch!"))
+register(MessageModule("custom_message", "Reminder!"))
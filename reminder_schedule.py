@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import bisect
+from datetime import timedelta
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class ReminderSchedule:
+    """Every fire time of the day of every enabled (module, minute) slot, in one sorted table.
+
+    Reminders repeat daily, so the table is built once per config: each
+    entry is (second of the day, slot). A cursor points at the next pending
+    entry; looking up the next fire time after any moment is a binary search
+    and moving on to the next one is a step, however many slots there are.
+    """
+
+    def __init__(self, config, modules, now):
+        self.config = config
+        self.interval_minutes = config["global_interval"]
+        self._slots = []
+        entries = []
+        for module in modules:
+            if not config[module]["enabled"]:
+                continue
+            for reminder in config[module]["reminders"]:
+                if not 0 <= reminder < min(self.interval_minutes, MINUTES_PER_DAY):
+                    continue
+                slot = len(self._slots)
+                self._slots.append((module, reminder))
+                for minute_of_day in range(reminder, MINUTES_PER_DAY, self.interval_minutes):
+                    entries.append((minute_of_day * 60, slot))
+        entries.sort()
+        self._seconds = [second for second, _ in entries]
+        self._entry_slots = [slot for _, slot in entries]
+        self._seek(now)
+
+    def _seek(self, after):
+        """Point the cursor at the first entry strictly after `after`."""
+        self._day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        second_of_day = (after - self._day).total_seconds()
+        self._index = bisect.bisect_right(self._seconds, second_of_day)
+        self._wrap()
+
+    def _wrap(self):
+        if self._index == len(self._seconds):
+            self._day += timedelta(days=1)
+            self._index = 0
+
+    def update(self, config, modules, now):
+        """Switch to a new config, keeping the schedule's place in the day.
+
+        Reminders that are already due stay due. Returns the number of
+        (added, removed) slots.
+        """
+        old_slots = set(self._slots)
+        upcoming = self.peek()
+        overdue = upcoming is not None and upcoming[0] <= now
+        cursor = upcoming[0] - timedelta(microseconds=1) if overdue else now
+        new = ReminderSchedule(config, modules, cursor)
+        new_slots = set(new._slots)
+        self.__dict__.update(new.__dict__)
+        return len(new_slots - old_slots), len(old_slots - new_slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def peek(self):
+        if not self._seconds:
+            return None
+        module, reminder = self._slots[self._entry_slots[self._index]]
+        return self._day + timedelta(seconds=self._seconds[self._index]), module, reminder
+
+    def pop_due(self, now):
+        """Return every slot due at `now` and move the cursor past `now`.
+
+        A slot that was missed several times (e.g. across a suspend) is
+        returned once, with its earliest missed time, so it never fires in a
+        burst.
+        """
+        if not self._seconds:
+            return []
+        # Every slot fires at least once a day, so older entries add nothing
+        earliest = now - timedelta(days=1)
+        if self.peek()[0] < earliest:
+            self._seek(earliest)
+        due = {}
+        while self.peek()[0] <= now:
+            fire_time, module, reminder = self.peek()
+            due.setdefault(self._entry_slots[self._index], (fire_time, module, reminder))
+            self._index += 1
+            self._wrap()
+        return list(due.values())
+
+    def status(self, now):
+        upcoming = self.peek()
+        if upcoming is None:
+            return {
+                "running": True,
+                "next_reminder": None,
+                "next_fire": None,
+                "time_to_next": "00:00",
+                "total_interval": f"{self.interval_minutes:02d}",
+            }
+        fire_time, module, _ = upcoming
+        seconds_to_next = max(0, int((fire_time - now).total_seconds()))
+        minutes_to_next, seconds_to_next = divmod(seconds_to_next, 60)
+        return {
+            "running": True,
+            "next_reminder": module,
+            "next_fire": fire_time.timestamp(),
+            "time_to_next": f"{minutes_to_next:02d}:{seconds_to_next:02d}",
+            "total_interval": f"{self.interval_minutes:02d}",
+        }
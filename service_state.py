@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import subprocess
+import threading
+import time
+
+SERVICE_NAME = "Remind2Rest"
+PROPERTIES = ("ActiveState", "SubState", "UnitFileState")
+# UnitFileState values for which `systemctl is-enabled` succeeds
+ENABLED_STATES = (
+    "enabled",
+    "enabled-runtime",
+    "static",
+    "indirect",
+    "alias",
+    "generated",
+    "transient",
+)
+
+
+class SystemctlBackend:
+    """Talks to the user's systemd instance through the systemctl command."""
+
+    def show(self, unit, properties):
+        result = subprocess.run(
+            ["systemctl", "--user", "show", unit, f"--property={','.join(properties)}"],
+            capture_output=True,
+            text=True,
+        )
+        values = {}
+        for line in result.stdout.splitlines():
+            key, _, value = line.partition("=")
+            values[key] = value
+        return values
+
+    def run(self, action, unit):
+        subprocess.run(["systemctl", "--user", action, unit], capture_output=True)
+
+
+class ServiceState:
+    """Cached state of the Remind2Rest systemd user unit.
+
+    Every property is read with one `systemctl show` call and kept for `ttl`
+    seconds; the service's own start/stop/enable/disable actions drop the
+    cache so their effect shows up at once. Any object with the backend's
+    show/run methods can stand in for systemctl.
+    """
+
+    def __init__(self, unit=SERVICE_NAME, backend=None, ttl=5.0):
+        self.unit = unit
+        self.backend = backend if backend is not None else SystemctlBackend()
+        self.ttl = ttl
+        self._properties = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+
+    def properties(self):
+        with self._lock:
+            if self._properties is None or time.monotonic() - self._read_at > self.ttl:
+                self._properties = self.backend.show(self.unit, PROPERTIES)
+                self._read_at = time.monotonic()
+            return self._properties
+
+    def invalidate(self):
+        with self._lock:
+            self._properties = None
+
+    def is_running(self):
+        return self.properties().get("ActiveState") == "active"
+
+    def is_enabled(self):
+        return self.properties().get("UnitFileState") in ENABLED_STATES
+
+    def info(self):
+        running = self.is_running()
+        return {
+            "status": "Running" if running else "Stopped",
+            "running": running,
+            "enabled": self.is_enabled(),
+        }
+
+    def start(self):
+        self._run("start")
+
+    def stop(self):
+        self._run("stop")
+
+    def enable(self):
+        self._run("enable")
+
+    def disable(self):
+        self._run("disable")
+
+    def _run(self, action):
+        try:
+            self.backend.run(action, self.unit)
+        finally:
+            self.invalidate()
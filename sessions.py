@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import logging
+import os
+import pwd
+import threading
+import time
+from datetime import datetime
+
+import metrics
+import reminder_modules
+import reminder_jobs
+from config_watcher import ConfigWatcher
+from dispatch_queue import DISPATCHED, OUTCOMES, PRIORITY_ADHOC, PRIORITY_SCHEDULED, DispatchQueue
+from metrics import LatencyHistogram
+from rate_limit import Backoff, TokenBucket
+from reminder_modules import configured_modules, validate_config
+from reminder_schedule import ReminderSchedule
+from user_identity import fs_identity, set_fs_identity
+
+# Where a user's files live, relative to their home directory
+CONFIG_NAME = os.path.join(".config", "Remind2Rest", "reminder_config.json")
+DATA_NAME = os.path.join(".local", "share", "Remind2Rest")
+
+REMINDERS = metrics.counter(
+    "remind2rest_reminders_total", "Reminders shown or skipped, by module", ("module", "outcome")
+)
+# custom_reminder requests a user may send: a burst of ADHOC_BURST, then
+# ADHOC_RATE a second
+ADHOC_RATE = 0.1
+ADHOC_BURST = 5
+
+SESSIONS = metrics.gauge("remind2rest_sessions", "Open user sessions of a shared daemon")
+
+
+def load_config(raw, config_path):
+    try:
+        config = json.loads(raw)
+        validate_config(config)
+        return config
+    except json.JSONDecodeError:
+        logging.error(f"Error: Invalid JSON in {config_path}")
+    except ValueError as e:
+        logging.error(f"Error: Invalid configuration - {str(e)}")
+    return None
+
+
+class Session:
+    """One user's reminders: their config, schedule, ratings and reminder UI.
+
+    A single-user daemon runs one Session with the defaults. A shared daemon
+    runs one per logged-in user, with `identity` (uid, gid) for every access
+    to the user's files and `display` for their reminder windows. Its
+    reminders then have their own scheduler job, and its events go only to
+    that user's subscribers.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        config_path,
+        events,
+        name=None,
+        identity=None,
+        display=None,
+        xauthority=None,
+        data_dir=None,
+        renderer=None,
+    ):
+        self.scheduler = scheduler
+        self.config_path = config_path
+        self.events = events
+        self.name = name
+        self.identity = identity
+        self.display = display
+        self.xauthority = xauthority
+        self.data_dir = data_dir
+        self.renderer = renderer
+        self.job_id = "next_reminder" if name is None else f"next_reminder:{name}"
+        self.custom_job_id = self.job_id.replace("next_reminder", "next_custom_reminder")
+        self.topic = None if identity is None else identity[0]
+        self.schedule = None
+        self.config_digest = None
+        self.current_status = {}
+        # How late reminders were shown, and how many a misfire policy dropped
+        self.trigger_latency = LatencyHistogram()
+        self.skipped = 0
+        self.adhoc_limit = TokenBucket(ADHOC_RATE, ADHOC_BURST)
+        self.rate_limited = 0
+        self.watcher = None
+        self.ui = None
+        self._ui_backoff = Backoff()
+        # Dispatch counts of the UIs this session has replaced
+        self._retired_dispatch = dict.fromkeys(OUTCOMES, 0)
+        self.reminders = reminder_jobs.ReminderStore(
+            os.path.join(data_dir, "reminders.sqlite3"), identity
+        )
+        # Held while the schedule is changed, by reloads on the dispatch threads and
+        # by fired reminders on the scheduler thread
+        self.lock = threading.Lock()
+        # Held for a whole reload, which RELOAD requests and the config watcher
+        # may start at the same time on different threads
+        self._reload_lock = threading.Lock()
+        self._custom_lock = threading.Lock()
+        self._adhoc_lock = threading.Lock()
+        self._ui_lock = threading.Lock()
+
+    def publish(self, event, data=None):
+        self.events.publish(event, data, topic=self.topic)
+
+    def reload_config(self, version=None):
+        """Apply the config file if its content changed since it was last applied.
+
+        An unchanged file costs one read and a hash; it is neither parsed nor
+        validated again. When the caller names the config `version` it wrote
+        and that version is already applied, the file is not even read.
+        Returns a summary of what was done.
+        """
+        with self._reload_lock:
+            return self._reload_config(version)
+
+    def _reload_config(self, version):
+        if version is not None and self.schedule is not None:
+            if self.schedule.config.get("version") == version:
+                return {"changed": False, "version": version}
+        try:
+            with fs_identity(self.identity):
+                with open(self.config_path, "rb") as file:
+                    raw = file.read()
+        except FileNotFoundError:
+            logging.error(f"Error: Config file not found at {self.config_path}")
+            return {"changed": False, "error": "Config file not found"}
+        except PermissionError:
+            logging.error(f"Error: Cannot read config file at {self.config_path}")
+            return {"changed": False, "error": "Config file not readable"}
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == self.config_digest:
+            return {"changed": False, "version": self.schedule.config.get("version")}
+        config = load_config(raw, self.config_path)
+        if config is None:
+            return {"changed": False, "error": "Invalid configuration"}
+        self.config_digest = digest
+        added, removed = self.schedule_reminders(config)
+        result = {
+            "changed": True,
+            "added": added,
+            "removed": removed,
+            "version": config.get("version"),
+        }
+        self.publish("config_reloaded", result)
+        return result
+
+    def update_status(self, status):
+        if (
+            not self.current_status
+            or self.current_status.get("next_reminder") != status["next_reminder"]
+        ):
+            minutes_to_next = int(status["time_to_next"].split(":")[0])
+            logging.info(
+                f"Next {status['next_reminder']} reminder in {minutes_to_next} minutes"
+            )
+        self.current_status = status
+
+    def status(self):
+        if self.schedule is None:
+            status = dict(self.current_status)
+        else:
+            status = self.schedule.status(datetime.now())
+        # Reading self.ui never starts the UI stack just for STATUS
+        status["ui_latency"] = self.ui.latency.stats() if self.ui is not None else {}
+        status["trigger_latency"] = dict(self.trigger_latency.stats(), skipped=self.skipped)
+        if self.ui is not None:
+            dispatch = self.ui.dispatch_stats()
+        else:
+            dispatch = dict(DispatchQueue.empty_stats(), visible=None)
+        for outcome, count in self._retired_dispatch.items():
+            dispatch[outcome] += count
+        status["dispatch"] = dict(dispatch, rate_limited=self.rate_limited)
+        return status
+
+    def schedule_reminders(self, config):
+        """Bring the schedule in line with `config`; returns (added, removed) slots."""
+        interval_minutes = config["global_interval"]
+        logging.info(f"Scheduling reminders with {interval_minutes} minute intervals")
+
+        modules = configured_modules(config)
+        with self.lock:
+            now = datetime.now()
+            if self.schedule is None:
+                self.schedule = ReminderSchedule(config, modules, now)
+                added, removed = len(self.schedule), 0
+                armed = None
+            else:
+                armed = self.schedule.peek()
+                added, removed = self.schedule.update(config, modules, now)
+            logging.info(f"Schedule updated: {added} reminders added, {removed} removed")
+
+            if not self.schedule:
+                logging.warning("No reminders enabled, nothing to schedule")
+                self.scheduler.cancel(self.job_id)
+                if armed is not None:
+                    self.publish("next_changed", self.schedule.status(now))
+                return added, removed
+
+            next_fire, next_module, _ = self.schedule.peek()
+            minutes_until = int((next_fire - now).total_seconds() // 60)
+            logging.info(
+                f"First {next_module} reminder will trigger in {minutes_until} minutes"
+            )
+            # The pending job only needs replacing when the earliest deadline moved
+            if self.schedule.peek() != armed:
+                self.arm_next_reminder()
+        return added, removed
+
+    def arm_next_reminder(self):
+        # A single one-shot job for the earliest deadline: the scheduler thread
+        # sleeps until then instead of waking up every second.
+        next_fire, _, _ = self.schedule.peek()
+        status = self.schedule.status(datetime.now())
+        self.update_status(status)
+        self.publish("next_changed", status)
+        self.scheduler.schedule(self.job_id, next_fire.timestamp(), self.fire_due_reminders)
+
+    def fire_due_reminders(self):
+        with self.lock:
+            if self.schedule is None:
+                return
+            config = self.schedule.config
+            # Each slot is due at most once, with its earliest missed time
+            due = self.schedule.pop_due(datetime.now())
+            if self.schedule:
+                self.arm_next_reminder()
+        policy, grace = reminder_modules.misfire_policy(config)
+        for fire_time, module, _ in due:
+            late = time.time() - fire_time.timestamp()
+            if policy == "skip" and late > grace:
+                self.record_missed(module, fire_time.timestamp(), late)
+                continue
+            self.trigger_reminder(module, config[module], late)
+
+    def trigger_reminder(self, module, settings, late=0.0):
+        logging.info(f"Triggering {module} reminder", extra={"reminder": module, "late": round(late, 3)})
+        self.trigger_latency.record(late)
+        REMINDERS.inc(module=module, outcome="fired")
+        self.publish("fired", {"module": module, "time": time.time(), "late": late})
+        reminder_modules.trigger(module, settings, self.get_ui())
+
+    def record_missed(self, module, fire_time, late):
+        logging.warning(
+            f"Skipping {module} reminder due at {datetime.fromtimestamp(fire_time)}, {late:.0f} s late",
+            extra={"reminder": module, "late": round(late, 3)},
+        )
+        self.skipped += 1
+        REMINDERS.inc(module=module, outcome="missed")
+        self.publish("missed", {"module": module, "time": fire_time, "late": late})
+
+    def show_adhoc_reminder(self, params):
+        """A custom_reminder request: shown unless the user sent too many lately.
+
+        Raises ValueError when the reminder is refused or cannot be shown.
+        """
+        with self._adhoc_lock:
+            admitted = self.adhoc_limit.take()
+            if not admitted:
+                self.rate_limited += 1
+        if not admitted:
+            DISPATCHED.inc(outcome="rate_limited")
+            raise ValueError("Too many custom reminders, try again later")
+        if self.show_custom_reminder(params, PRIORITY_ADHOC) == "dropped":
+            if not self.ui.running:
+                raise ValueError("The reminder UI is not running, the reminder was not shown")
+            raise ValueError("Too many reminders are waiting, the reminder was not shown")
+
+    def show_custom_reminder(self, params, priority, key=None):
+        """Hand a custom reminder to the UI; returns what became of it, as ReminderUI.submit."""
+        from notifications import show_custom_reminder
+
+        return show_custom_reminder(
+            params["message"],
+            params["flashing"],
+            params["duration"],
+            params["cancel_key"],
+            params["flashing_freq"],
+            params["initial_color"],
+            params["fontsize"],
+            ui=self.get_ui(),
+            priority=priority,
+            key=key,
+        )
+
+    def schedule_custom_reminder(self, request):
+        """Store a one-shot, repeating or cron custom reminder; returns the job."""
+        now = time.time()
+        kind, spec, misfire, misfire_grace = reminder_jobs.parse_job(request, now)
+        first_fire = reminder_jobs.next_fire(kind, spec, now)
+        if first_fire is None:
+            raise ValueError("The reminder would never fire")
+        params = reminder_jobs.custom_reminder_params(request)
+        job = self.reminders.add(kind, spec, params, misfire, misfire_grace, first_fire)
+        logging.info(f"Scheduled custom reminder {job['id']} ({kind}) for {datetime.fromtimestamp(first_fire)}")
+        self.arm_custom_reminders()
+        return job
+
+    def cancel_custom_reminder(self, job_id):
+        cancelled = self.reminders.cancel(job_id)
+        if cancelled:
+            self.arm_custom_reminders()
+        return {"cancelled": cancelled}
+
+    def arm_custom_reminders(self):
+        # Like the module reminders, one one-shot job for the earliest stored
+        # deadline; one that was missed while the daemon was down runs at once
+        next_fire = self.reminders.next_fire()
+        if next_fire is None:
+            self.scheduler.cancel(self.custom_job_id)
+            return
+        self.scheduler.schedule(self.custom_job_id, next_fire, self.fire_custom_reminders)
+
+    def fire_custom_reminders(self):
+        now = time.time()
+        shown = []
+        # The job re-arms itself and may run again at once on another thread;
+        # due jobs are moved on in the store before anyone else looks
+        with self._custom_lock:
+            for job in self.reminders.due(now):
+                runs, next_fire = reminder_jobs.due_runs(job, now)
+                self.reminders.reschedule(job["id"], next_fire)
+                if not runs:
+                    self.record_missed("custom", job["next_fire"], now - job["next_fire"])
+                shown.extend((job, fire_time) for fire_time in runs)
+            self.arm_custom_reminders()
+        for job, fire_time in shown:
+            late = time.time() - fire_time
+            logging.info(
+                f"Triggering custom reminder {job['id']}",
+                extra={"reminder": "custom", "job": job["id"], "late": round(late, 3)},
+            )
+            self.trigger_latency.record(late)
+            REMINDERS.inc(module="custom", outcome="fired")
+            self.publish("fired", {"module": "custom", "job": job["id"], "time": time.time(), "late": late})
+            # Each run is a reminder of its own, never coalesced with another
+            # run caught up with it
+            self.show_custom_reminder(
+                job["params"], PRIORITY_SCHEDULED, key=("custom", job["id"], fire_time)
+            )
+
+    def watch_config(self, loop):
+        # The socket server's event loop also serves the config watcher. Like
+        # every access to the user's files the watch is set up as the user, so
+        # it never reaches a directory they could not read themselves.
+        self.watcher = ConfigWatcher(self.config_path, lambda: self.reload_config())
+        try:
+            with fs_identity(self.identity):
+                self.watcher.start(loop)
+        except OSError as e:
+            self.watcher = None
+            logging.warning(f"Not watching the config file, changes need a RELOAD: {e}")
+
+    def get_ui(self):
+        """The reminder UI, started on first use.
+
+        A UI that failed to start or whose thread ended is replaced on a later
+        call, with a growing wait between failed attempts.
+        """
+        with self._ui_lock:
+            if self.identity is None:
+                from notifications import get_ui
+
+                ui = get_ui()
+                if self.ui is not None and ui is not self.ui:
+                    self._retire_ui(self.ui)
+                self.ui = ui
+            elif self.ui is None or not self.ui.running and self._ui_backoff.ready():
+                dead, self.ui = self.ui, self._start_ui()
+                if dead is not None:
+                    self._retire_ui(dead)
+                    dead.stop()
+            return self.ui
+
+    def _retire_ui(self, ui):
+        # What a replaced UI did stays in STATUS
+        stats = ui.dispatch_stats()
+        for outcome in OUTCOMES:
+            self._retired_dispatch[outcome] += stats[outcome]
+
+    def _start_ui(self):
+        from chart_cache import ChartCache
+        from notifications import ReminderUI
+        from ratings_store import RatingsStore
+
+        with fs_identity(self.identity):
+            ratings_store = RatingsStore(os.path.join(self.data_dir, "posture_ratings.bin"))
+        # Many users' charts in memory would add up; each user's stay on disk
+        chart_cache = ChartCache(
+            ratings_store,
+            renderer=self.renderer,
+            cache_dir=self.data_dir,
+            identity=self.identity,
+            keep_in_memory=False,
+        )
+        ui = ReminderUI(
+            self.display,
+            self.xauthority,
+            ratings_store,
+            chart_cache,
+            on_start=lambda: set_fs_identity(*self.identity),
+        )
+        if ui.start():
+            self._ui_backoff.succeeded()
+        else:
+            delay = self._ui_backoff.failed()
+            logging.error(
+                f"Reminder UI for {self.name} failed to start on {self.display}, "
+                f"trying again in {delay:.0f} s at the earliest"
+            )
+        return ui
+
+    def set_display(self, display, xauthority=None):
+        """Show reminders on `display` from now on."""
+        with self._ui_lock:
+            if (display, xauthority) == (self.display, self.xauthority):
+                return
+            self.display = display
+            self.xauthority = xauthority
+            self._ui_backoff.succeeded()
+            ui, self.ui = self.ui, None
+            if ui is not None:
+                self._retire_ui(ui)
+        if ui is not None:
+            ui.stop()
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        with self.lock:
+            self.scheduler.cancel(self.job_id)
+            self.scheduler.cancel(self.custom_job_id)
+            self.schedule = None
+        self.reminders.close()
+        with self._ui_lock:
+            ui, self.ui = self.ui, None
+        if ui is not None and self.identity is not None:
+            ui.stop()
+
+
+class SessionManager:
+    """The sessions of a shared daemon, one per user.
+
+    A user's session starts with their first JOIN and ends when the last
+    connection that joined closes. All sessions share the daemon's
+    scheduler, event loop and chart renderer process. Requests arrive on
+    several threads at once; `_lock` guards the sessions and their holders,
+    and is never held while a session opens, since STATUS takes it on the
+    event loop.
+    """
+
+    def __init__(self, scheduler, events):
+        self.scheduler = scheduler
+        self.events = events
+        self.sessions = {}
+        self._holders = {}
+        # uid -> Event set once the session being opened for it is ready
+        self._opening = {}
+        self._loop = None
+        self._renderer = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def join(self, peer, display=None, xauthority=None):
+        while True:
+            with self._lock:
+                self._holders.setdefault(peer.uid, set()).add(peer.connection)
+                session = self.sessions.get(peer.uid)
+                opening = self._opening.get(peer.uid)
+                if session is None and opening is None:
+                    # This connection opens the session; others of the user wait
+                    opening = self._opening[peer.uid] = threading.Event()
+                    break
+            if session is not None:
+                if display is not None:
+                    # The most recent login's display wins
+                    session.set_display(display, xauthority)
+                return session.status()
+            opening.wait()
+
+        try:
+            session = self._open(peer.uid, display, xauthority)
+        except Exception:
+            with self._lock:
+                del self._opening[peer.uid]
+                self._release(peer)
+            opening.set()
+            raise
+        with self._lock:
+            del self._opening[peer.uid]
+            # Every connection that joined may have closed in the meantime
+            kept = peer.uid in self._holders
+            if kept:
+                self.sessions[peer.uid] = session
+                SESSIONS.set(len(self.sessions))
+        opening.set()
+        if not kept:
+            session.close()
+            raise ValueError("The connection closed while its session was opening")
+        logging.info(f"Opened session of {session.name} on {display}")
+        return session.status()
+
+    def get(self, peer):
+        with self._lock:
+            session = self.sessions.get(peer.uid)
+        if session is None:
+            raise ValueError("No session for this user, send JOIN first")
+        return session
+
+    def disconnected(self, peer):
+        with self._lock:
+            session = self._release(peer)
+        if session is not None:
+            logging.info(f"Closing session of {session.name}")
+            session.close()
+
+    def _release(self, peer):
+        """Forget a connection; returns the session it was the last holder of, if open."""
+        holders = self._holders.get(peer.uid)
+        if holders is None or peer.connection not in holders:
+            return None
+        holders.discard(peer.connection)
+        if holders:
+            return None
+        del self._holders[peer.uid]
+        session = self.sessions.pop(peer.uid, None)
+        SESSIONS.set(len(self.sessions))
+        return session
+
+    def close(self):
+        with self._lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            self._holders.clear()
+            SESSIONS.set(0)
+        for session in sessions:
+            session.close()
+
+    def _open(self, uid, display, xauthority):
+        from chart_renderer import ChartRenderer
+
+        user = pwd.getpwuid(uid)
+        identity = (user.pw_uid, user.pw_gid)
+        data_dir = os.path.join(user.pw_dir, DATA_NAME)
+        with fs_identity(identity):
+            os.makedirs(data_dir, exist_ok=True)
+        with self._lock:
+            # Starts no process; the worker is only spawned by the first render
+            if self._renderer is None:
+                self._renderer = ChartRenderer()
+        session = Session(
+            self.scheduler,
+            os.path.join(user.pw_dir, CONFIG_NAME),
+            self.events,
+            name=user.pw_name,
+            identity=identity,
+            display=display,
+            xauthority=xauthority,
+            data_dir=data_dir,
+            renderer=self._renderer,
+        )
+        result = session.reload_config()
+        if "error" in result:
+            raise ValueError(result["error"])
+        if self._loop is not None:
+            session.watch_config(self._loop)
+        session.arm_custom_reminders()
+        return session
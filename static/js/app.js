@@ -6,6 +6,7 @@ new Vue({
         const initialData = JSON.parse(document.getElementById('initial-data').textContent);
         return {
             config: initialData.config || {
+                version: 0,
                 global_interval: 60,
                 eye_relax: {
                     enabled: false,
@@ -16,11 +17,15 @@ new Vue({
                 posture: {
                     enabled: false,
                     wait_duration: 3,
+                    history_days: 1,
                     reminders: []
                 }
             },
             serviceStatus: 'Unknown',
             isServiceRunning: false,
+            nextReminder: null,
+            nextFire: null,
+            now: Date.now() / 1000,
             isServiceEnabled: false,
             autostartStatus: '',
             slider: null,
@@ -41,6 +46,9 @@ new Vue({
             
             axios.post('/save_config', this.config)
                 .then(response => {
+                    if (response.data.version !== undefined) {
+                        this.config.version = response.data.version;
+                    }
                     if (response.data.status === 'success') {
                         button.classList.add('saving-success');
                         setTimeout(() => button.classList.remove('saving-success'), 3000);
@@ -53,6 +61,10 @@ new Vue({
                 .catch(error => {
                     button.classList.add('saving-error');
                     setTimeout(() => button.classList.remove('saving-error'), 3000);
+                    if (error.response?.status === 409) {
+                        // Saved from another tab in the meantime; don't overwrite it
+                        this.showSaveStatus(false, error.response.data.message);
+                    }
                     console.error('Save error:', error.response?.data?.message || error);
                 });
         },
@@ -121,7 +133,7 @@ new Vue({
             }
 
             const allReminders = Object.entries(this.config)
-                .filter(([key, value]) => key !== 'global_interval' && value.enabled)
+                .filter(([key, value]) => typeof value === 'object' && value.enabled)
                 .flatMap(([module, data]) =>
                     data.reminders.map(time => ({ time, module }))
                 );
@@ -207,7 +219,7 @@ new Vue({
                 });
 
                 Object.keys(this.config).forEach(module => {
-                    if (module !== 'global_interval' && this.config[module].enabled) {
+                    if (typeof this.config[module] === 'object' && this.config[module].enabled) {
                         this.config[module].reminders = allReminders
                             .filter(r => r.module === module)
                             .map(r => r.time)
@@ -242,6 +254,28 @@ new Vue({
             this.config.global_interval = parseInt(this.config.global_interval) || 60;
             this.updateSlider();
         },
+        connectEvents() {
+            // One long-lived stream instead of polling; the browser reconnects on its own
+            this.eventSource = new EventSource('/events');
+            const onStatus = (event) => {
+                const status = JSON.parse(event.data);
+                this.nextReminder = status.next_reminder;
+                this.nextFire = status.next_fire;
+            };
+            this.eventSource.addEventListener('status', onStatus);
+            this.eventSource.addEventListener('next_changed', onStatus);
+            this.eventSource.addEventListener('service_state', (event) => {
+                this.isServiceRunning = JSON.parse(event.data).running;
+                this.serviceStatus = this.isServiceRunning ? 'Running' : 'Stopped';
+                if (!this.isServiceRunning) {
+                    this.nextReminder = null;
+                    this.nextFire = null;
+                }
+            });
+            this.eventSource.addEventListener('config_reloaded', (event) => {
+                console.log('Configuration reloaded:', JSON.parse(event.data));
+            });
+        },
         showSaveStatus(success, message) {
             this.saveStatus.show = true;
             this.saveStatus.success = success;
@@ -274,22 +308,29 @@ new Vue({
             this.updateSlider();
         });
     },
+    computed: {
+        countdown() {
+            if (!this.nextFire) {
+                return '';
+            }
+            const seconds = Math.max(0, Math.round(this.nextFire - this.now));
+            const minutes = Math.floor(seconds / 60);
+            return `${String(minutes).padStart(2, '0')}:${String(seconds % 60).padStart(2, '0')}`;
+        }
+    },
     created() {
-        // Start ping interval when component is created
-        console.log('Starting ping interval...');
-        this.pingInterval = setInterval(() => {
-            axios.post('/ping')
-                .then(() => console.log('Ping sent successfully'))
-                .catch((error) => {
-                    console.error('Ping failed:', error);
-                    clearInterval(this.pingInterval);
-                });
-        }, 5000);
+        this.connectEvents();
+        // The countdown ticks locally from the last next_fire timestamp
+        this.clockInterval = setInterval(() => {
+            this.now = Date.now() / 1000;
+        }, 1000);
     },
     beforeDestroy() {
-        console.log('Cleaning up ping interval...');
-        if (this.pingInterval) {
-            clearInterval(this.pingInterval);
+        if (this.eventSource) {
+            this.eventSource.close();
+        }
+        if (this.clockInterval) {
+            clearInterval(this.clockInterval);
         }
     }
 });
\ No newline at end of file
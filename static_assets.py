@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, abort, request
+
+COMPRESSIBLE = (".js", ".css", ".html", ".svg", ".json")
+ONE_YEAR = 365 * 24 * 3600
+
+
+def compressed_response(body, gzipped, mimetype):
+    """Send the precomputed gzip copy of `body` to clients that accept it."""
+    if gzipped is not None and request.accept_encodings["gzip"]:
+        response = Response(gzipped, mimetype=mimetype)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def gzip_if_smaller(data):
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    return compressed if len(compressed) < len(data) else None
+
+
+class StaticAssets:
+    """The app's static files, held in memory with a content hash and a gzip copy.
+
+    url_for("static", ...) gets a ?v=<hash> argument, so a changed file
+    always gets a new URL and browsers may keep any versioned URL for a
+    year. Files are read once, when the app starts.
+    """
+
+    def __init__(self, app):
+        self.files = {}
+        for root, _, names in os.walk(app.static_folder):
+            for name in names:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, app.static_folder).replace(os.sep, "/")
+                with open(path, "rb") as file:
+                    data = file.read()
+                digest = hashlib.sha256(data).hexdigest()[:16]
+                gzipped = gzip_if_smaller(data) if name.endswith(COMPRESSIBLE) else None
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                self.files[filename] = (digest, data, gzipped, mimetype)
+        app.view_functions["static"] = self.serve
+        app.url_defaults(self.add_version)
+
+    def add_version(self, endpoint, values):
+        if endpoint == "static" and values.get("filename") in self.files:
+            values["v"] = self.files[values["filename"]][0]
+
+    def serve(self, filename):
+        asset = self.files.get(filename)
+        if asset is None:
+            abort(404)
+        digest, data, gzipped, mimetype = asset
+        if digest in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = compressed_response(data, gzipped, mimetype)
+        response.set_etag(digest)
+        if request.args.get("v") == digest:
+            response.headers["Cache-Control"] = f"public, max-age={ONE_YEAR}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -4,11 +4,14 @@ import gi
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("AppIndicator3", "0.1")
-from gi.repository import Gtk, AppIndicator3
+from gi.repository import Gtk, GLib, AppIndicator3
 import os
 import json
-import subprocess
+import threading
+import time
 import webbrowser
+from remind2rest_client import Remind2RestClient
+from service_state import ServiceState
 
 
 class Remind2RestIndicator:
@@ -19,6 +22,8 @@ class Remind2RestIndicator:
             AppIndicator3.IndicatorCategory.APPLICATION_STATUS,
         )
         self.indicator.set_status(AppIndicator3.IndicatorStatus.ACTIVE)
+        self.client = Remind2RestClient(timeout=1.0)
+        self.service_state = ServiceState()
         self.create_menu()
 
     def create_menu(self):
@@ -53,35 +58,66 @@ class Remind2RestIndicator:
         menu.show_all()
         self.indicator.set_menu(menu)
 
-        # Update status initially and every 5 seconds
+        # The status follows the daemon's event stream; systemd is only
+        # asked when the daemon connection comes or goes
+        self.service_status = "Checking..."
+        self.next_reminder = None
+        self.next_fire = None
+        threading.Thread(target=self.follow_events, name="Events", daemon=True).start()
+        # Only the countdown text ticks; it is computed locally
+        GLib.timeout_add_seconds(30, self.update_status)
+
+    def follow_events(self):
+        backoff = 1.0
+        connected = None
+        while True:
+            try:
+                for message in self.client.subscribe():
+                    if connected is not True:
+                        connected = True
+                        backoff = 1.0
+                        GLib.idle_add(self.on_service_changed)
+                    if message["event"] in ("status", "next_changed"):
+                        GLib.idle_add(self.on_next_changed, message["data"])
+            except Exception:
+                pass
+            if connected is not False:
+                connected = False
+                GLib.idle_add(self.on_next_changed, {})
+                GLib.idle_add(self.on_service_changed)
+            time.sleep(backoff)
+            backoff = min(30.0, backoff * 2)
+
+    def on_service_changed(self):
+        self.service_state.invalidate()
+        try:
+            self.service_status = self.service_state.info()["status"]
+        except Exception:
+            self.service_status = "Unknown"
+        self.update_status()
+        return False
+
+    def on_next_changed(self, status):
+        self.next_reminder = status.get("next_reminder")
+        self.next_fire = status.get("next_fire")
         self.update_status()
-        GLib.timeout_add_seconds(5, self.update_status)
+        return False
 
     def update_status(self):
-        try:
-            result = subprocess.run(
-                ["systemctl", "--user", "is-active", "Remind2Rest"],
-                capture_output=True,
-                text=True,
-            )
-            status = "Running" if result.stdout.strip() == "active" else "Stopped"
-            self.status_item.set_label(f"Status: {status}")
-        except Exception as e:
-            self.status_item.set_label("Status: Unknown")
+        label = f"Status: {self.service_status}"
+        if self.next_reminder and self.next_fire:
+            minutes = max(0, int(self.next_fire - time.time()) // 60)
+            label += f" (next {self.next_reminder} in {minutes} min)"
+        self.status_item.set_label(label)
         return True
 
     def toggle_service(self, _):
         try:
-            result = subprocess.run(
-                ["systemctl", "--user", "is-active", "Remind2Rest"],
-                capture_output=True,
-                text=True,
-            )
-            if result.stdout.strip() == "active":
-                subprocess.run(["systemctl", "--user", "stop", "Remind2Rest"])
+            if self.service_state.is_running():
+                self.service_state.stop()
             else:
-                subprocess.run(["systemctl", "--user", "start", "Remind2Rest"])
-            self.update_status()
+                self.service_state.start()
+            self.on_service_changed()
         except Exception as e:
             dialog = Gtk.MessageDialog(
                 None,
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import itertools
+import logging
+import math
+import os
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# From <sys/timerfd.h>
+CLOCK_REALTIME = 0
+TFD_NONBLOCK = os.O_NONBLOCK
+TFD_CLOEXEC = os.O_CLOEXEC
+TFD_TIMER_ABSTIME = 1
+TFD_TIMER_CANCEL_ON_SET = 2
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class _Itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", _Timespec), ("it_value", _Timespec)]
+
+SCHEDULER_WAKEUPS = metrics.counter(
+    "remind2rest_scheduler_wakeups_total", "Times the trigger engine woke up to check its jobs"
+)
+SCHEDULER_RUNS = metrics.counter(
+    "remind2rest_scheduler_runs_total", "Jobs the trigger engine ran, by outcome", ("outcome",)
+)
+SCHEDULER_LATENESS = metrics.histogram(
+    "remind2rest_scheduler_lateness_seconds",
+    "How long after its scheduled time a job started running",
+)
+SCHEDULER_JOBS = metrics.gauge("remind2rest_scheduler_jobs", "Jobs waiting in the trigger engine")
+
+
+class WallClockTimer:
+    """A timerfd that becomes readable once the wall clock reaches a given time.
+
+    The wall clock keeps counting while the machine is suspended, so the
+    timer fires right after a resume that took it past its time. It is
+    armed with TFD_TIMER_CANCEL_ON_SET, so it also fires when the clock
+    is stepped.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(self._libc, "timerfd_create"):
+            raise OSError("timerfd is not available on this platform")
+        fd = self._libc.timerfd_create(CLOCK_REALTIME, TFD_NONBLOCK | TFD_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_create failed")
+        self.fd = fd
+
+    def arm(self, when):
+        fraction, seconds = math.modf(when)
+        spec = _Itimerspec(_Timespec(0, 0), _Timespec(int(seconds), int(fraction * 1e9)))
+        flags = TFD_TIMER_ABSTIME | TFD_TIMER_CANCEL_ON_SET
+        if self._libc.timerfd_settime(self.fd, flags, ctypes.byref(spec), None) < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_settime failed")
+
+    def clear(self):
+        try:
+            os.read(self.fd, 8)
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # The clock was stepped; arming the timer again resets it
+            if e.errno != errno.ECANCELED:
+                raise
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TriggerEngine:
+    """Runs callbacks at wall-clock times, with every wait timed on the monotonic clock.
+
+    A deadline is turned into a monotonic one when it is scheduled, so
+    stepping the wall clock never stretches a sleep. The monotonic clock
+    stands still while the machine is suspended, though, so the engine
+    also arms a WallClockTimer for the earliest job: a job is due as soon
+    as either clock has reached its deadline, and between jobs the engine
+    does not wake up at all. Where timerfd is unavailable it falls back to
+    sleeping no longer than `max_sleep` at a time. Callbacks run on a small
+    thread pool, so a slow one (a chart render, a UI starting up) never
+    delays another.
+    """
+
+    def __init__(self, max_sleep=30.0, workers=4):
+        self.max_sleep = max_sleep
+        self._jobs = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        # A byte on this pipe makes the engine look at its jobs again
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self._running = False
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Trigger")
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TriggerEngine", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            self._running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def schedule(self, job_id, run_at, func):
+        """Call `func` at `run_at` (epoch seconds), replacing any pending job `job_id`."""
+        with self._lock:
+            sequence = next(self._sequence)
+            deadline = time.monotonic() + (run_at - time.time())
+            self._jobs[job_id] = (run_at, func, sequence)
+            heapq.heappush(self._heap, (deadline, sequence, job_id))
+        self._wake()
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def pending(self, job_id):
+        """The time job `job_id` is due, or None when there is no such job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job[0] if job is not None else None
+
+    def _wake(self):
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            # The pipe is full, so the engine is waking up anyway
+            pass
+
+    def _run(self):
+        try:
+            timer = WallClockTimer()
+        except OSError as e:
+            logging.warning(f"No wall clock timer, checking jobs every {self.max_sleep:g} s: {e}")
+            timer = None
+        try:
+            while True:
+                with self._lock:
+                    if not self._running:
+                        return
+                    wait, run_at = self._next_wait()
+                if wait is not None and wait <= 0:
+                    continue
+                self._sleep(timer, wait, run_at)
+        finally:
+            if timer is not None:
+                timer.close()
+
+    def _next_wait(self):
+        """(seconds until the earliest job, its wall-clock time), submitting the jobs that are due."""
+        SCHEDULER_WAKEUPS.inc()
+        SCHEDULER_JOBS.set(len(self._jobs))
+        # Entries of cancelled or replaced jobs are dropped lazily
+        while self._heap and self._is_stale(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None, None
+        deadline, _, job_id = self._heap[0]
+        run_at, func, _ = self._jobs[job_id]
+        wait = min(deadline - time.monotonic(), run_at - time.time())
+        if wait <= 0:
+            heapq.heappop(self._heap)
+            del self._jobs[job_id]
+            self._executor.submit(self._call, job_id, run_at, func)
+        return wait, run_at
+
+    def _sleep(self, timer, wait, run_at):
+        readers = [self._wake_read]
+        if timer is not None:
+            if run_at is not None:
+                timer.arm(run_at)
+                readers.append(timer.fd)
+        elif wait is not None:
+            wait = min(wait, self.max_sleep)
+        ready, _, _ = select.select(readers, [], [], wait)
+        if self._wake_read in ready:
+            try:
+                os.read(self._wake_read, 4096)
+            except BlockingIOError:
+                pass
+        if timer is not None and timer.fd in ready:
+            timer.clear()
+
+    def _is_stale(self, entry):
+        _, sequence, job_id = entry
+        job = self._jobs.get(job_id)
+        return job is None or job[2] != sequence
+
+    def _call(self, job_id, run_at, func):
+        SCHEDULER_LATENESS.observe(time.time() - run_at)
+        try:
+            func()
+        except Exception as e:
+            SCHEDULER_RUNS.inc(outcome="error")
+            logging.error(f"Error running {job_id}: {e}")
+        else:
+            SCHEDULER_RUNS.inc(outcome="ok")
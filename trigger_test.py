@@ -1,10 +1,8 @@
 #!/usr/bin/env python3
-import socket
-import json
+from remind2rest_client import Remind2RestClient
 
 # Prepare the custom reminder message
 msg = {
-    "action": "custom_reminder",
     "message": "Drink water!",
     "flashing": True,
     "flashing_freq": 10,       # 20 Hz flashing
@@ -14,13 +12,10 @@ msg = {
     "fontsize": 180
 }
 
-SOCKET_PATH = "/home/schneider/.Remind2Rest.sock"
-
 try:
-    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
-        s.connect(SOCKET_PATH)
-        s.sendall(json.dumps(msg).encode())
-        response = s.recv(1024)
-        print(f"Response from Remind2Rest: {response.decode()}")
+    client = Remind2RestClient()
+    response = client.request("custom_reminder", **msg)
+    print(f"Response from Remind2Rest: {response}")
+    client.close()
 except Exception as e:
     print(f"Failed to trigger reminder: {e}")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import contextlib
+import ctypes
+import ctypes.util
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return _libc
+
+
+def set_fs_identity(uid, gid):
+    """Make the calling thread access files as uid/gid.
+
+    Linux keeps the filesystem uid and gid per thread, so this affects only
+    the calling thread and, unlike seteuid, leaves other threads of a
+    privileged daemon alone. Supplementary groups are per process and are
+    not changed. Returns the previous (uid, gid).
+    """
+    libc = _get_libc()
+    # The group has to change first, while the thread may still do so
+    previous_gid = libc.setfsgid(gid)
+    previous_uid = libc.setfsuid(uid)
+    # setfsuid reports failure only by leaving the id unchanged
+    if libc.setfsuid(-1) != uid or libc.setfsgid(-1) != gid:
+        libc.setfsuid(previous_uid)
+        libc.setfsgid(previous_gid)
+        raise PermissionError(f"Cannot access files as uid {uid}, gid {gid}")
+    return previous_uid, previous_gid
+
+
+@contextlib.contextmanager
+def fs_identity(identity):
+    """Run the body with the thread's files accessed as `identity`, a (uid, gid) pair.
+
+    A None identity leaves the thread as it is.
+    """
+    if identity is None:
+        yield
+        return
+    previous_uid, previous_gid = set_fs_identity(*identity)
+    try:
+        yield
+    finally:
+        libc = _get_libc()
+        libc.setfsuid(previous_uid)
+        libc.setfsgid(previous_gid)
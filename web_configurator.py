@@ -1,19 +1,27 @@
 # app.py
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
+import gzip
 import json
+import logging
+import math
 import os
-import subprocess
+import queue
+import tempfile
 import time
 import webbrowser
 import threading
-from datetime import datetime
 import sys
-import socket
+import metrics
+from log_pipeline import setup_logging, shutdown_logging
+from remind2rest_client import Remind2RestClient, send_command
+from service_state import ServiceState
+from static_assets import StaticAssets, compressed_response
 
 browser_opened = False
-last_ping_time = None
-ping_timeout = 10  # seconds
+client_timeout = 10  # seconds without an open page before shutting down
+# Comment lines sent on idle event streams; also how fast a closed page is noticed
+KEEPALIVE_SECONDS = 5
 
 # Add these constants at the top
 STARTUP_MSG = """
@@ -22,7 +30,93 @@ STARTUP_MSG = """
 ╚════════════════════════════════════╝
 """
 
+# Ranges with more ratings than this are streamed as NDJSON
+STREAM_THRESHOLD = 10000
+STREAM_CHUNK = 4096
+
 app = Flask(__name__)
+static_assets = StaticAssets(app)
+ratings_store = None
+service_state = ServiceState()
+# (config file size and mtime, parsed config) of the last read or save
+config_cache = None
+config_write_lock = threading.Lock()
+# (config file size and mtime, rendered page, gzipped page)
+index_cache = None
+
+
+class EventRelay:
+    """One SUBSCRIBE connection to the daemon, fanned out to every /events stream.
+
+    The relay also tracks how many pages are connected, which is what keeps
+    the configurator running. While the daemon is down it retries with a
+    growing delay, or at once after `wake`.
+    """
+
+    def __init__(self, max_backoff=5.0):
+        self.max_backoff = max_backoff
+        self.status = None
+        self.running = None
+        self.changed = threading.Condition()
+        self.streams = set()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def attach(self):
+        stream = queue.Queue()
+        with self.changed:
+            if self.running is not None:
+                stream.put(("service_state", {"running": self.running}))
+            if self.status is not None:
+                stream.put(("status", self.status))
+            self.streams.add(stream)
+            self.changed.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="EventRelay", daemon=True
+                )
+                self._thread.start()
+        return stream
+
+    def detach(self, stream):
+        with self.changed:
+            self.streams.discard(stream)
+            self.changed.notify_all()
+
+    def wake(self):
+        self._wake.set()
+
+    def _publish(self, event, data):
+        with self.changed:
+            if event in ("status", "next_changed"):
+                self.status = data
+            elif event == "service_state":
+                self.running = data["running"]
+                # The daemon came or went; what systemd says changed too
+                service_state.invalidate()
+            for stream in self.streams:
+                stream.put((event, data))
+
+    def _run(self):
+        client = Remind2RestClient()
+        backoff = 0.5
+        while True:
+            try:
+                for message in client.subscribe():
+                    if self.running is not True:
+                        self._publish("service_state", {"running": True})
+                    backoff = 0.5
+                    self._publish(message["event"], message.get("data"))
+            except Exception as e:
+                if self.running is not False:
+                    logging.warning(f"Lost connection to Remind2Rest: {e}")
+                    self._publish("service_state", {"running": False})
+            self._wake.wait(backoff)
+            self._wake.clear()
+            backoff = min(self.max_backoff, backoff * 2)
+
+
+event_relay = EventRelay()
 
 # Use XDG config path
 CONFIG_PATH = os.path.expanduser("~/.config/Remind2Rest/reminder_config.json")
@@ -30,67 +124,251 @@ script_dir = os.path.dirname(os.path.realpath(__file__))
 reminder_app_path = os.path.join(script_dir, "Remind2Rest.py")
 
 
+def config_file_key():
+    try:
+        st = os.stat(CONFIG_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
 def load_config():
+    """The saved config; the file is only read again once it changed on disk."""
+    global config_cache
+    key = config_file_key()
+    cached = config_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
     try:
         with open(CONFIG_PATH, "r") as file:
-            return json.load(file)
+            config = json.load(file)
     except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+        config = {}
+    config_cache = (key, config)
+    return config
+
+
+class ConfigConflict(Exception):
+    """The config was saved by someone else since the client loaded it."""
+
+    def __init__(self, current):
+        super().__init__("Configuration was changed elsewhere, reload to see the latest version")
+        self.current = current
 
 
-def save_config(config):
+def save_config(config, expected_version=None):
+    """Write `config` as the next version and return that version number.
+
+    With `expected_version`, the write only happens if the file still holds
+    that version (compare-and-swap); otherwise ConfigConflict is raised.
+    The file is replaced with a rename, so readers never see a partial write.
+    """
+    global config_cache, index_cache
+    with config_write_lock:
+        current = load_config()
+        current_version = current.get("version", 0)
+        if expected_version is not None and expected_version != current_version:
+            raise ConfigConflict(current)
+        config = dict(config, version=current_version + 1)
+        try:
+            config_dir = os.path.dirname(CONFIG_PATH)
+            os.makedirs(config_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=config_dir, prefix=".reminder_config.")
+            try:
+                with os.fdopen(fd, "w") as file:
+                    json.dump(config, file, indent=2)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, CONFIG_PATH)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            print(f"💾 Configuration version {config['version']} saved to {CONFIG_PATH}")
+            config_cache = (config_file_key(), config)
+            index_cache = None
+        except Exception as e:
+            logging.error(f"Failed to save configuration: {e}")
+            raise
+    return config["version"]
+
+
+def reload_service(version=None):
+    """Ask the daemon to apply the saved config; returns its summary or None."""
     try:
-        os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-        with open(CONFIG_PATH, "w") as file:
-            json.dump(config, file, indent=2)
-            print(f"💾 Configuration saved to {CONFIG_PATH}")
+        if version is None:
+            return send_command("RELOAD")
+        return send_command("RELOAD", version=version)
     except Exception as e:
-        print(f"❌ Failed to save configuration: {e}")
-        raise
+        logging.error(f"Error sending command: {e}")
+        return None
+
 
+def get_ratings_store():
+    # numpy is only needed once the ratings API is actually used
+    global ratings_store
+    if ratings_store is None:
+        from ratings_store import RatingsStore
 
-def send_command_to_service(command):
-    sock_path = os.path.expanduser("~/.Remind2Rest.sock")
+        ratings_store = RatingsStore()
+    return ratings_store
+
+
+def query_number(name, default=None, convert=float):
+    """The query argument `name` as a finite number, `default` when absent.
+
+    Raises ValueError for a value that is not a number, so a malformed
+    argument is answered with 400 instead of quietly meaning something else.
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return default
     try:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
-            sock.connect(sock_path)
-            sock.sendall(command.encode())
-            return True
-    except Exception as e:
-        print(f"Error sending command: {e}")
-        return False
+        value = convert(raw)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}': {raw!r}") from None
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid '{name}': {raw!r}")
+    return value
+
+
+def ratings_window():
+    """Resolve the start/end/days query arguments to a record window.
+
+    Returns (store, lo, hi, etag). The ETag combines the store's write
+    marker with the record indices, so it changes both when a rating is
+    added and when old ratings slide out of a relative range. Every window
+    of a store that was never written shares the ETag "empty".
+    """
+    end = query_number("end")
+    if end is None:
+        end = time.time()
+    start = query_number("start")
+    if start is None:
+        start = end - query_number("days", 1) * 86400
+    if start > end:
+        raise ValueError("start must not be after end")
+    store = get_ratings_store()
+    lo, hi = store.locate(start, end)
+    version = store.version()
+    if version is None:
+        return store, lo, hi, "empty"
+    return store, lo, hi, f"{version}-{lo}-{hi}"
+
+
+def not_modified(etag):
+    if etag in request.if_none_match:
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    return None
+
+
+@app.route("/api/ratings")
+def api_ratings():
+    try:
+        store, lo, hi, etag = ratings_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    if hi - lo > STREAM_THRESHOLD or request.args.get("format") == "ndjson":
+
+        def generate():
+            # One chunk of lines per slice, so memory stays flat for any range
+            for chunk_lo in range(lo, hi, STREAM_CHUNK):
+                times, ratings = store.read_slice(chunk_lo, min(chunk_lo + STREAM_CHUNK, hi))
+                yield "".join(
+                    f'{{"time": {t}, "rating": {r}}}\n'
+                    for t, r in zip(times.tolist(), ratings.tolist())
+                )
+
+        response = Response(generate(), mimetype="application/x-ndjson")
+    else:
+        times, ratings = store.read_slice(lo, hi)
+        response = jsonify(
+            {
+                "count": hi - lo,
+                "ratings": [
+                    {"time": t, "rating": r}
+                    for t, r in zip(times.tolist(), ratings.tolist())
+                ],
+            }
+        )
+    response.set_etag(etag)
+    return response
+
+
+@app.route("/api/ratings/summary")
+def api_ratings_summary():
+    try:
+        store, lo, hi, etag = ratings_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        window_seconds = query_number("window", 86400, int)
+        good_rating = query_number("good", 4, int)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # The current day streak also depends on today's date
+    etag = f"{etag}-{window_seconds}-{good_rating}-{time.strftime('%Y%m%d')}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
+    from ratings_analytics import summarize
 
-def reload_service():
-    return send_command_to_service("RELOAD")
+    times, ratings = store.read_slice(lo, hi)
+    response = jsonify(summarize(times, ratings, window_seconds, good_rating))
+    response.set_etag(etag)
+    return response
 
 
 @app.route("/")
 def index():
-    initial_save_status = {"show": False, "success": False, "message": ""}
-    return render_template(
-        "index.html", config=load_config(), saveStatus=initial_save_status
-    )
+    # The page only changes with the config, so render and compress it once per version
+    global index_cache
+    key = config_file_key()
+    cached = index_cache
+    if cached is None or cached[0] != key:
+        initial_save_status = {"show": False, "success": False, "message": ""}
+        page = render_template(
+            "index.html", config=load_config(), saveStatus=initial_save_status
+        ).encode()
+        cached = index_cache = (key, page, gzip.compress(page, mtime=0))
+    response = compressed_response(cached[1], cached[2], "text/html")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route("/save_config", methods=["POST"])
 def save_configuration():
     try:
-        new_config = request.json
-        save_config(new_config)
-        if reload_service():
+        new_config = dict(request.json)
+        # Clients that predate versioning send none and overwrite unconditionally
+        expected_version = new_config.pop("version", None)
+        version = save_config(new_config, expected_version)
+        result = reload_service(version)
+        if result is not None and "error" not in result:
             return jsonify(
                 {
                     "status": "success",
                     "message": "Configuration saved and service reloaded successfully",
+                    "version": version,
+                    "reload": result,
                 }
             )
         return jsonify(
             {
                 "status": "error",
                 "message": "Configuration saved but failed to reload service",
+                "version": version,
             }
         )
+    except ConfigConflict as e:
+        return (
+            jsonify({"status": "conflict", "message": str(e), "config": e.current}),
+            409,
+        )
     except Exception as e:
         return (
             jsonify(
@@ -106,19 +384,15 @@ def save_configuration():
 @app.route("/toggle_service", methods=["POST"])
 def toggle_service():
     try:
-        result = subprocess.run(
-            ["systemctl", "--user", "is-active", "Remind2Rest"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            subprocess.run(["systemctl", "--user", "stop", "Remind2Rest"])
+        if service_state.is_running():
+            service_state.stop()
             status = "Stopped"
             running = False
         else:
-            subprocess.run(["systemctl", "--user", "start", "Remind2Rest"])
+            service_state.start()
             status = "Running"
             running = True
+        event_relay.wake()
         return jsonify({"status": status, "running": running})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -179,25 +453,7 @@ Categories=Utility;Application;
 @app.route("/service_info")
 def service_info():
     try:
-        # Check if service is running
-        result = subprocess.run(
-            ["systemctl", "--user", "is-active", "Remind2Rest"],
-            capture_output=True,
-            text=True,
-        )
-        is_running = result.returncode == 0
-
-        # Check if service is enabled
-        result = subprocess.run(
-            ["systemctl", "--user", "is-enabled", "Remind2Rest"],
-            capture_output=True,
-            text=True,
-        )
-        is_enabled = result.returncode == 0
-
-        status = "Running" if is_running else "Stopped"
-
-        return jsonify({"status": status, "running": is_running, "enabled": is_enabled})
+        return jsonify(service_state.info())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -205,16 +461,11 @@ def service_info():
 @app.route("/toggle_service_enabled", methods=["POST"])
 def toggle_service_enabled():
     try:
-        result = subprocess.run(
-            ["systemctl", "--user", "is-enabled", "Remind2Rest"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            subprocess.run(["systemctl", "--user", "disable", "Remind2Rest"])
+        if service_state.is_enabled():
+            service_state.disable()
             enabled = False
         else:
-            subprocess.run(["systemctl", "--user", "enable", "Remind2Rest"])
+            service_state.enable()
             enabled = True
         return jsonify({"enabled": enabled})
     except Exception as e:
@@ -243,6 +494,8 @@ Categories=Utility;
 
 
 def shutdown_server():
+    # os._exit skips atexit, so write out the queued log records first
+    shutdown_logging()
     try:
         os._exit(0)
     except Exception as e:
@@ -265,38 +518,86 @@ def open_browser():
             print("🌐 Web interface opened in browser")
             browser_opened = True
         except Exception as e:
-            print(f"❌ Failed to open browser: {e}")
+            logging.error(f"Failed to open browser: {e}")
 
 
 def check_connection_timeout():
-    global last_ping_time
+    # Woken by pages opening and closing their event stream; no polling
     print(STARTUP_MSG)
     print("🔄 Starting connection monitor...")
-    while True:
-        time.sleep(2)
-        current_time = datetime.now()
-        if last_ping_time:
-            time_since_ping = (current_time - last_ping_time).seconds
-            if time_since_ping > ping_timeout:
+    print("⏳ Waiting for client connection...")
+    with event_relay.changed:
+        event_relay.changed.wait_for(lambda: event_relay.streams)
+        print("✅ Client connected successfully")
+        while True:
+            event_relay.changed.wait_for(lambda: not event_relay.streams)
+            # Give a reloading page the chance to reconnect
+            if not event_relay.changed.wait_for(
+                lambda: event_relay.streams, timeout=client_timeout
+            ):
                 print("\n❌ Client disconnected, shutting down server...")
                 shutdown_server()
-        else:
-            print("⏳ Waiting for client connection...")
-            time.sleep(
-                5
-            )  # Only check every 5 seconds when waiting for first connection
 
 
-@app.route("/ping", methods=["POST"])
-def ping():
-    global last_ping_time
-    if last_ping_time is None:
-        print("✅ Client connected successfully")
-    last_ping_time = datetime.now()
-    return jsonify({"status": "pong"})
+@app.route("/events")
+def events():
+    def generate():
+        stream = event_relay.attach()
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event, data = stream.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Also how a closed page is noticed: this write fails
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_relay.detach(stream)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """The daemon's metrics in the Prometheus text format, for scraping."""
+    try:
+        snapshot = send_command("METRICS")
+        up = 1
+    except Exception as e:
+        logging.warning(f"Error fetching metrics: {e}")
+        snapshot, up = {}, 0
+    snapshot["remind2rest_up"] = {
+        "type": "gauge",
+        "help": "Whether the daemon answered the METRICS request",
+        "samples": [{"labels": {}, "value": up}],
+    }
+    return Response(metrics.prometheus_text(snapshot), mimetype="text/plain; version=0.0.4")
+
+
+def run_server(host="127.0.0.1", port=5000):
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    if serve is not None:
+        print("🚀 Serving with waitress")
+        # Every open page holds one thread for its event stream
+        serve(app, host=host, port=port, threads=16)
+    else:
+        from werkzeug.serving import make_server
+
+        print("🚀 Serving with the threaded Werkzeug server (install waitress for production use)")
+        make_server(host, port, app, threaded=True).serve_forever()
 
 
 if __name__ == "__main__":
+    setup_logging("web_configurator", console=True)
     threading.Thread(target=open_browser).start()
     threading.Thread(target=check_connection_timeout, daemon=True).start()
-    app.run(debug=True, use_reloader=False)
+    run_server()